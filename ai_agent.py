@@ -3,22 +3,35 @@ from typing import TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.message import add_messages
+from langchain_core.runnables import RunnableConfig
 import json
-import pandas as pd
 import duckdb
 from datetime import datetime
+import threading
 import uuid
+from contextlib import contextmanager
 from openai import OpenAI
 import os
 import dotenv
+from sql_exemplars import ExemplarStore, format_exemplars
+from temporal_resolver import resolve_date_range, substitute_current_date
+from schema_registry import SchemaRegistry
+from query_cache import answer_cache, cache_key, normalize_question, query_log, result_cache, sql_cache
+from llm_scheduler import LLMScheduler, LLMSchedulerError, PRIORITY_BATCH
 
 dotenv.load_dotenv()
 
 client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
+  base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
   api_key=os.getenv("OPENROUTER_API_KEY"),
+  # 429s, 5xx and connection errors are retried by llm_scheduler, where
+  # retries go through admission control and a 429 pauses all queued calls
+  max_retries=0,
 )
 
+# All outbound LLM calls share one key, so they go through central admission control
+llm_scheduler = LLMScheduler(client)
+
 class Message(TypedDict):
     """Message structure for conversation history"""
     role: str  # "user" or "assistant"
@@ -40,7 +53,8 @@ class AgentState(TypedDict):
     language: str
     schema: str
     sql_query: str
-    query_result: str
+    query_result: str  # Status/error text; tabular results are referenced by result_id
+    result_id: str  # Key of the Arrow result table in result_cache ("" if none)
     final_answer: str
     error: str
     iteration: int
@@ -48,6 +62,11 @@ class AgentState(TypedDict):
     graph_type: str
     graph_json: str  # Plotly figure JSON for Chainlit
     is_in_scope: bool  # Whether the question is about e-commerce data
+    today: str  # Reference date (YYYY-MM-DD) used for all relative dates
+    date_start: str  # Resolved start of the question's date range (YYYY-MM-DD, "" if none)
+    date_end: str  # Resolved end of the question's date range (YYYY-MM-DD, "" if none)
+    date_expression: str  # Temporal expression the range was resolved from
+    date_exact: bool  # False when the range only bounds several separate dates
     # LangGraph memory - messages accumulate automatically across invocations
     messages: Annotated[list[Message], message_reducer]
 
@@ -83,39 +102,63 @@ OPTIMIZED_SQL_SYSTEM_PROMPT = """You are a DuckDB SQL expert for blood donation
 - Return ONLY the SQL query (no markdown, no backticks, no explanations)
 - If unanswerable, return: NOT_ANSWERABLE
 
-## TABLE & COLUMNS
-Table: `blood_donation_events.csv` (NO quotes around table name)
-
-Columns (all lowercase snake_case):
-| Column | Type | Description |
-|--------|------|-------------|
-| event_day | TEXT | Day of week (Sunday, Monday, etc.) |
-| event_date | DATE | Event date (YYYY-MM-DD format) |
-| event_title | TEXT | Campaign name (UPPERCASE) |
-| event_url | TEXT | Event webpage URL |
-| organizer | TEXT | Hosting organization (UPPERCASE) |
-| blood_donation_location | TEXT | Full venue address (UPPERCASE) |
-| start_time | TEXT | Start time (e.g., "10.00 PAGI") |
-| end_time | TEXT | End time (e.g., "5.00 PETANG") |
-| blood_donor_target | INTEGER | Target donor count (0 = no target) |
+## TABLES & COLUMNS
+The relevant tables and columns are listed in each request (all lowercase snake_case).
 
 ## KEY RULES
-1. **Table reference**: `FROM blood_donation_events.csv` (no quotes)
+1. **Table reference**: Use table names exactly as listed, e.g. `FROM blood_donation_events.csv` (no quotes)
 2. **Text matching**: Always use `ILIKE` for case-insensitive search
-3. **Date filtering**: Use `event_date` with CURRENT_DATE for relative dates
+3. **Date filtering**: Use `event_date` with the literal resolved date range when one is given
 4. **SELECT only**: No INSERT, UPDATE, DELETE, DROP, ALTER
 
 ## DATE PATTERNS
-- Today: `WHERE event_date = CURRENT_DATE`
-- This week: `WHERE event_date BETWEEN CURRENT_DATE AND CURRENT_DATE + INTERVAL '7 days'`
-- This month: `WHERE YEAR(event_date) = YEAR(CURRENT_DATE) AND MONTH(event_date) = MONTH(CURRENT_DATE)`
-- Specific date: `WHERE event_date = '2025-04-12'`
+- Resolved range: `WHERE event_date BETWEEN '2025-04-12' AND '2025-04-13'`
+- Single day: `WHERE event_date = '2025-04-12'`
+- Upcoming: `WHERE event_date >= '<today's date>'`"""
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Queryable sources; only the parts relevant to a question go into the prompt
+schema_registry = SchemaRegistry()
+schema_registry.register(
+    "blood_donation_events.csv",
+    os.path.join(DATA_DIR, "blood_donation_events.csv"),
+    description=(
+        "Blood donation events in Malaysia. Each row = one event at one location on one date; "
+        "the same event_title can appear multiple times (different locations/dates)."
+    ),
+    keywords=["event", "events", "blood", "donation", "derma", "darah", "kempen", "acara", "program"],
+    core_columns=["event_date", "event_title", "organizer", "blood_donation_location", "start_time", "end_time"],
+    column_descriptions={
+        "event_day": "Day of week (informational only, filter on event_date instead)",
+        "event_date": "Event date (YYYY-MM-DD), use for ALL date filtering",
+        "event_title": "Campaign name (UPPERCASE)",
+        "event_url": "Event webpage URL",
+        "organizer": "Hosting organization (UPPERCASE)",
+        "blood_donation_location": "Full venue address (UPPERCASE, use ILIKE for search)",
+        "start_time": "Start time string (e.g. \"10.00 PAGI\")",
+        "end_time": "End time string (e.g. \"5.00 PETANG\")",
+        "blood_donor_target": "Target donor count stored as text; use TRY_CAST(blood_donor_target AS INTEGER) (0 = no target)",
+    },
+    column_keywords={
+        "event_date": ["date", "when", "tarikh", "bila"],
+        "organizer": ["organiser", "organized", "organised", "penganjur", "anjuran"],
+        "blood_donation_location": ["where", "location", "venue", "place", "lokasi", "tempat", "mana"],
+        "start_time": ["time", "start", "masa", "mula"],
+        "end_time": ["time", "end", "masa", "tamat"],
+        "blood_donor_target": ["target", "donors", "sasaran", "penderma"],
+        "event_url": ["link", "url", "website", "pautan"],
+    },
+)
+
+def validate_sql(sql_query: str):
+    """Raise if the query doesn't bind against the registered sources (nothing is executed)"""
+    duckdb.connect().sql(f"EXPLAIN {schema_registry.resolve_table_refs(sql_query)}")
+
 
-## QUERY EXAMPLES
-Count events: `SELECT COUNT(*) AS total FROM blood_donation_events.csv`
-Events in location: `SELECT * FROM blood_donation_events.csv WHERE blood_donation_location ILIKE '%bangi%' ORDER BY event_date`
-By organizer: `SELECT * FROM blood_donation_events.csv WHERE organizer ILIKE '%kipmall%'`
-Total targets: `SELECT SUM(blood_donor_target) AS total FROM blood_donation_events.csv`"""
+# Verified question -> SQL pairs; the most similar ones are injected per question
+exemplar_store = ExemplarStore(validate=validate_sql)
+EXEMPLAR_TOP_K = 3
 
 
 # SQL Generation Agent
@@ -135,17 +178,91 @@ def format_messages_for_context(messages: list) -> str:
     return "\n".join(formatted)
 
 
-def duckdbsql_agent(state: AgentState) -> AgentState:
+def temporal_agent(state: AgentState) -> dict:
+    """Resolve English/Malay temporal expressions into an explicit date range
+
+    Returns only the fields it sets: returning the whole state would append
+    the conversation history to itself through message_reducer.
+    """
+    today = state.get("today") or datetime.now().strftime("%Y-%m-%d")
+    date_range = resolve_date_range(state["question"], now=datetime.strptime(today, "%Y-%m-%d"))
+
+    if not date_range:
+        return {"today": today, "date_start": "", "date_end": "", "date_expression": "", "date_exact": True}
+
+    print(f"DEBUG - Resolved '{date_range['expression']}' to {date_range['start']} .. {date_range['end']}")
+    return {
+        "today": today,
+        "date_start": date_range["start"],
+        "date_end": date_range["end"],
+        "date_expression": date_range["expression"],
+        "date_exact": date_range["exact"],
+    }
+
+
+def format_date_range(state: AgentState) -> str:
+    """Format the resolved date range for the SQL prompt"""
+    if not state.get("date_start"):
+        return f"No date expression in the question. For upcoming events use event_date >= '{state.get('today')}'."
+    if not state.get("date_exact", True):
+        return (
+            f"- The question mentions several separate dates (\"{state['date_expression']}\"), all between "
+            f"'{state['date_start']}' and '{state['date_end']}'. Work out each one from today's date and "
+            f"filter only those dates, as the question asks."
+        )
+    if state["date_start"] == state["date_end"]:
+        return f"- \"{state['date_expression']}\" → WHERE event_date = '{state['date_start']}' (use exactly as given)"
+    return (
+        f"- \"{state['date_expression']}\" → "
+        f"WHERE event_date BETWEEN '{state['date_start']}' AND '{state['date_end']}' (use exactly as given)"
+    )
+
+
+def sql_cache_key(state: AgentState):
+    """sql_cache key for a standalone question; None for follow-ups, which depend on history"""
+    if state.get("messages"):
+        return None
+    today = state.get("today") or datetime.now().strftime("%Y-%m-%d")
+    return cache_key("sql", normalize_question(state["question"]), today, schema_registry.data_version())
+
+
+def remember_sql(state: AgentState):
+    """Cache a standalone question's SQL; only called once the query has run"""
+    sql_key = sql_cache_key(state)
+    if sql_key is not None:
+        sql_cache.set(sql_key, state["sql_query"])
+
+
+def duckdbsql_agent(state: AgentState) -> dict:
     """Generate SQL query from natural language question"""
+    update = {}
     question = state["question"]
     iteration = state.get("iteration", 0)
     messages = state.get("messages", [])
         
-    # Get current date for context
-    current_date = datetime.now()
+    # Get the reference date for context
+    today = state.get("today") or datetime.now().strftime("%Y-%m-%d")
+    current_date = datetime.strptime(today, "%Y-%m-%d")
+
+    # Follow-up questions depend on history, so only standalone ones are cached
+    sql_key = sql_cache_key(state)
+    if sql_key is not None:
+        cached_sql = sql_cache.get(sql_key)
+        if cached_sql is not None:
+            print(f"DEBUG - SQL cache hit: {repr(cached_sql)}")
+            update["sql_query"] = cached_sql
+            update["iteration"] = iteration + 1
+            return update
     
     # Format conversation context from LangGraph memory
     history_context = format_messages_for_context(messages)
+
+    # Only the tables/columns relevant to this question go into the prompt
+    schema_context = schema_registry.schema_text(question)
+    update["schema"] = schema_context
+
+    # Retrieve the most similar verified examples for this question
+    examples_context = format_exemplars(exemplar_store.search(question, k=EXEMPLAR_TOP_K))
     
     prompt = f"""Generate a DuckDB SQL query for this question about blood donation events in Malaysia.
 
@@ -156,36 +273,27 @@ def duckdbsql_agent(state: AgentState) -> AgentState:
 ## QUESTION
 {question}
 
-## DATASET INFO
-- Table: `blood_donation_events.csv` (NO quotes)
-- Each row = one blood donation event at one location on one date
-- Same event_title can appear multiple times (different locations/dates)
-
-## COLUMNS (all lowercase)
-- event_day: Day of week (text, informational only)
-- event_date: Event date (YYYY-MM-DD format, use for ALL date filtering)
-- event_title: Campaign name (UPPERCASE text)
-- organizer: Hosting organization (UPPERCASE text)
-- blood_donation_location: Full venue address (UPPERCASE text, use ILIKE for search)
-- start_time, end_time: Time strings (e.g., "10.00 PAGI", "5.00 PETANG")
-- blood_donor_target: Integer (0 = no target specified)
+## SCHEMA
+{schema_context}
 
 ## RULES
 1. Return ONLY the SQL query - no markdown, no explanation
 2. Use ILIKE for all text matching (case-insensitive)
 3. Use event_date for date filtering (not event_day)
-4. Table name without quotes: FROM blood_donation_events.csv
+4. Table names exactly as listed, without quotes (e.g. FROM blood_donation_events.csv)
 5. If question cannot be answered with this data, return: NOT_ANSWERABLE
+6. Filter dates as described under RESOLVED DATE RANGE, with literal dates (not CURRENT_DATE)
+
+## RESOLVED DATE RANGE
+{format_date_range(state)}
 
-## DATE EXAMPLES
-- "today" → WHERE event_date = CURRENT_DATE
-- "this week" → WHERE event_date BETWEEN CURRENT_DATE AND CURRENT_DATE + INTERVAL '7 days'
-- "this month" → WHERE YEAR(event_date) = YEAR(CURRENT_DATE) AND MONTH(event_date) = MONTH(CURRENT_DATE)
+## SIMILAR EXAMPLES (dates are illustrative; use the resolved date range above)
+{examples_context}
 
 Generate the SQL query now:"""
 
     
-    response = client.chat.completions.create(
+    response = llm_scheduler.chat_completion(
         model="openai/gpt-oss-120b:free",
         messages=[
             {"role": "system", "content": OPTIMIZED_SQL_SYSTEM_PROMPT},
@@ -199,83 +307,111 @@ Generate the SQL query now:"""
     
     sql_query = raw_response.strip()
     sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+    # Pin relative dates to the reference date so the query is deterministic
+    sql_query = substitute_current_date(sql_query, today)
     
     print(f"DEBUG - Cleaned SQL Query: {repr(sql_query)}")
+
+    # Cached by executer_agent once the query has run successfully
+    update["sql_query"] = sql_query
+    update["iteration"] = iteration + 1
     
-    state["sql_query"] = sql_query
-    state["iteration"] = iteration + 1
-    
-    return state
+    return update
+
+def run_tables(config: RunnableConfig = None) -> dict:
+    """Per-run holder of Arrow tables, passed in the (non-checkpointed) run config
+
+    Tables are pinned here for the whole run, so a result_cache eviction
+    between executer_agent and analysis_agent can't lose the result.
+    """
+    if config is None:
+        return {}
+    return config.get("configurable", {}).setdefault("result_tables", {})
+
 
-def executer_agent(state: AgentState) -> AgentState:
+def get_result_table(state: AgentState, config: RunnableConfig = None):
+    """Arrow table referenced by the state, or None if there is none"""
+    result_id = state.get("result_id")
+    if not result_id:
+        return None
+    table = run_tables(config).get(result_id)
+    return table if table is not None else result_cache.get(result_id)
+
+
+def format_query_result(state: AgentState, config: RunnableConfig = None) -> str:
+    """Query result as text for an LLM prompt"""
+    table = get_result_table(state, config)
+    if table is None:
+        return state.get("query_result") or "No results found."
+    return json.dumps(table.to_pylist(), indent=2, ensure_ascii=False, default=str)
+
+
+def executer_agent(state: AgentState, config: RunnableConfig) -> dict:
     """Execute the generated SQL query (handles multiple queries if present)"""
     sql_query = state["sql_query"]
     question = state.get("question", "")
-    
-    # Define the full path to the CSV file
-    csv_path = "blood_donation_events.csv"
+    update = {"query_result": "", "result_id": ""}
     
     try:
         # Debug: Log the SQL query
         print(f"Executing SQL Query: {sql_query}")
         
-        # Replace the table name with the full path in single quotes
-        # This ensures DuckDB can find the file regardless of current working directory
-        modified_sql = sql_query.replace(
-            "blood_donation_events.csv", 
-            f"'{csv_path}'"
-        )
-        
-        # Also handle cases where the table name might already have quotes
-        modified_sql = modified_sql.replace(
-            "'blood_donation_events.csv'",
-            f"'{csv_path}'"
-        )
-        modified_sql = modified_sql.replace(
-            '"blood_donation_events.csv"',
-            f"'{csv_path}'"
-        )
+        # Replace registered table names with their file paths in single quotes
+        # This ensures DuckDB can find the files regardless of current working directory
+        modified_sql = schema_registry.resolve_table_refs(sql_query)
         
         print(f"Modified SQL Query: {modified_sql}")
+
+        result_key = cache_key("result", modified_sql, schema_registry.data_version())
+        cached_table = result_cache.get(result_key)
+        if cached_table is not None:
+            print("DEBUG - Result cache hit")
+            run_tables(config)[result_key] = cached_table
+            remember_sql(state)
+            update["query_result"] = ""
+            update["result_id"] = result_key
+            return update
         
         # Execute the SQL query
         result = duckdb.sql(modified_sql)
 
         # Check if result is None
         if result is None:
-            state["query_result"] = "SQL execution failed. Please check the query."
-            return state
+            update["query_result"] = "SQL execution failed. Please check the query."
+            return update
 
-        # Fetch the DataFrame
-        df = result.fetchdf()
+        # Fetch as an Arrow table; it is only serialized where a prompt needs text
+        table = result.fetch_arrow_table()
+        # Only SQL that executed is reused; failing SQL is regenerated next time
+        remember_sql(state)
 
-        if df.empty:
+        if table.num_rows == 0:
             # Check if user is asking about a future date beyond available data
             # Get the max date in the dataset
             try:
-                max_date_query = f"SELECT MAX(event_date) as max_date FROM '{csv_path}'"
-                max_date_result = duckdb.sql(max_date_query).fetchdf()
-                max_date = max_date_result['max_date'].iloc[0]
+                events_path = schema_registry.path("blood_donation_events.csv")
+                max_date_query = f"SELECT MAX(event_date) as max_date FROM '{events_path}'"
+                max_date = duckdb.sql(max_date_query).fetchone()[0]
                 
                 # Extract date from user question if possible
-                state["query_result"] = json.dumps({
+                update["query_result"] = json.dumps({
                     "status": "no_results",
                     "max_available_date": str(max_date) if max_date else None,
                     "message": "No results found for this query."
                 })
             except:
-                state["query_result"] = "No results found."
+                update["query_result"] = "No results found."
         else:
-            state["query_result"] = df.to_json(
-                orient="records", 
-                indent=2, 
-                date_format="iso",
-                date_unit="ms"
-            )
+            # State only carries a reference, which keeps the table out of
+            # the checkpointer; the run config pins it until the run ends
+            result_cache.set(result_key, table)
+            run_tables(config)[result_key] = table
+            update["query_result"] = ""
+            update["result_id"] = result_key
     except Exception as e:
-        state["query_result"] = f"Error during SQL execution: {str(e)}"
+        update["query_result"] = f"Error during SQL execution: {str(e)}"
 
-    return state
+    return update
 
 ANALYSIS_AGENT_PROMPT = """You are a friendly blood donation assistant for Malaysia. Transform database results into helpful, human-readable responses.
 
@@ -342,20 +478,34 @@ If the query result shows "no_results" or is empty, AND the user's question ment
 ❌ Include technical details
 ❌ Use more than 4 emojis per response"""
 
-def analysis_agent(state: AgentState) -> AgentState:
+def analysis_agent(state: AgentState, config: RunnableConfig) -> dict:
     """Generate natural language answer from query results"""
+    update = {}
     question = state["question"]
     sql_query = state["sql_query"]
-    query_result = state["query_result"]
     messages = state.get("messages", [])
     
-    # Get current date for context
-    current_date = datetime.now()
+    # Get the reference date for context
+    current_date = datetime.strptime(state.get("today") or datetime.now().strftime("%Y-%m-%d"), "%Y-%m-%d")
     
+    # Standalone questions with identical results on the same day get the same answer
+    answer_key = None
+    result_ref = state.get("result_id") or state.get("query_result", "")
+    if not messages and not result_ref.startswith("Error"):
+        answer_key = cache_key("answer", normalize_question(question), current_date.strftime('%Y-%m-%d'), result_ref)
+    cached_answer = answer_cache.get(answer_key) if answer_key else None
+
     # Format conversation context from LangGraph memory
     history_context = format_messages_for_context(messages)
-    
-    prompt = f"""Transform these blood donation event results into a friendly response.
+
+    if cached_answer is not None:
+        print("DEBUG - Answer cache hit")
+        final_answer = cached_answer
+    else:
+        # Serialize the result only now that a prompt needs it
+        query_result = format_query_result(state, config)
+
+        prompt = f"""Transform these blood donation event results into a friendly response.
 
 **User's Question:** {question}
 
@@ -371,15 +521,17 @@ def analysis_agent(state: AgentState) -> AgentState:
 
 Generate a friendly, clear response following the formatting guidelines. Match the user's language (English/Malay)."""
 
-    response = client.chat.completions.create(
-        model="openai/gpt-oss-120b:free",
-        messages=[
-            {"role": "system", "content": ANALYSIS_AGENT_PROMPT},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    final_answer = response.choices[0].message.content.strip()
-    state["final_answer"] = final_answer
+        response = llm_scheduler.chat_completion(
+            model="openai/gpt-oss-120b:free",
+            messages=[
+                {"role": "system", "content": ANALYSIS_AGENT_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        final_answer = response.choices[0].message.content.strip()
+        if answer_key:
+            answer_cache.set(answer_key, final_answer)
+    update["final_answer"] = final_answer
 
     # Add messages to LangGraph memory (user question + assistant response)
     # These will automatically accumulate via the message_reducer
@@ -387,29 +539,38 @@ Generate a friendly, clear response following the formatting guidelines. Match t
         {"role": "user", "content": question},
         {"role": "assistant", "content": final_answer}
     ]
-    state["messages"] = new_messages
+    update["messages"] = new_messages
     
-    return state
+    return update
 
 # Build the LangGraph workflow
-def create_text2sql_graph():
-    """Create the LangGraph state graph for Text2SQL with memory support"""
+def create_text2sql_graph(with_memory: bool = True):
+    """Create the LangGraph state graph for Text2SQL with memory support
+
+    Args:
+        with_memory: Attach a checkpointer; disable for one-off runs such as cache warm-up
+    """
     
     workflow = StateGraph(AgentState)
     
     # Add nodes
+    workflow.add_node("temporal_agent", temporal_agent)
     workflow.add_node("duckdbsql_agent", duckdbsql_agent)
     workflow.add_node("executer_agent", executer_agent)
     workflow.add_node("analysis_agent", analysis_agent)
 
     
     # Add edges - start with guardrails check
-    workflow.set_entry_point("duckdbsql_agent")
+    workflow.set_entry_point("temporal_agent")
+    workflow.add_edge("temporal_agent", "duckdbsql_agent")
     workflow.add_edge("duckdbsql_agent", "executer_agent")
     workflow.add_edge("executer_agent", "analysis_agent")
 
     workflow.add_edge("analysis_agent", END)
     
+    if not with_memory:
+        return workflow.compile()
+
     # Add memory checkpointer for conversation persistence
     memory = MemorySaver()
     
@@ -418,26 +579,19 @@ def create_text2sql_graph():
 
 # Create the compiled graph with memory
 text2sql_graph = create_text2sql_graph()
+# Stateless graph for questions without a conversation thread (API, warm-up),
+# so they don't leave checkpoints behind
+stateless_graph = create_text2sql_graph(with_memory=False)
 
-def run_text2sql_workflow(question: str, thread_id: str = None) -> AgentState:
-    """Run the Text2SQL workflow with LangGraph memory
-    
-    Args:
-        question: The user's question
-        thread_id: Unique ID for the conversation thread (maintains history)
-    
-    Returns:
-        AgentState with the final answer
-    """
-    if thread_id is None:
-        thread_id = str(uuid.uuid4())
-    
-    initial_state = AgentState(
+def create_initial_state(question: str, now: datetime) -> AgentState:
+    """Fresh AgentState for a question asked at `now`"""
+    return AgentState(
         question=question,
         language="",
         schema="",
         sql_query="",
         query_result="",
+        result_id="",
         final_answer="",
         error="",
         iteration=0,
@@ -445,20 +599,100 @@ def run_text2sql_workflow(question: str, thread_id: str = None) -> AgentState:
         graph_type="",
         graph_json="",
         is_in_scope=True,
+        today=now.strftime("%Y-%m-%d"),
+        date_start="",
+        date_end="",
+        date_expression="",
+        date_exact=True,
         messages=[]  # LangGraph memory handles accumulation via checkpointer
     )
+
+
+# thread_id -> [lock, number of runs holding or waiting for it]
+_thread_locks: dict[str, list] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def thread_turn(thread_id: str = None):
+    """Run one turn of a conversation thread at a time
+
+    Concurrent turns on one thread would each start from the same
+    checkpoint, and one turn's messages would be lost. Stateless runs
+    (thread_id None) are not serialized.
+    """
+    if thread_id is None:
+        yield
+        return
+    with _thread_locks_guard:
+        entry = _thread_locks.setdefault(thread_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _thread_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[thread_id]
+
+
+def _prepare_run(question: str, thread_id: str = None, now: datetime = None):
+    """Graph, initial state and config for one question"""
+    if now is None:
+        now = datetime.now()
+    initial_state = create_initial_state(question, now)
+
+    # result_tables pins this run's Arrow results (dicts are never checkpointed)
+    if thread_id is None:
+        graph = stateless_graph
+        config = {"configurable": {"result_tables": {}}, "recursion_limit": 50}
+    else:
+        # Configuration with thread_id for memory persistence
+        graph = text2sql_graph
+        config = {
+            "configurable": {"thread_id": thread_id, "result_tables": {}},
+            "recursion_limit": 50
+        }
+
+    # Frequent questions are replayed standalone by the cache warmer, so
+    # follow-ups (whose meaning depends on the conversation) are not logged
+    has_history = thread_id is not None and graph.get_state({"configurable": {"thread_id": thread_id}}).values.get("messages")
+    if not has_history:
+        try:
+            query_log.append(question, timestamp=now.timestamp())
+        except OSError as e:
+            print(f"DEBUG - Could not write query log: {e}")
+
+    return graph, initial_state, config
+
+
+def run_text2sql_workflow(question: str, thread_id: str = None, now: datetime = None) -> AgentState:
+    """Run the Text2SQL workflow with LangGraph memory
     
-    # Configuration with thread_id for memory persistence
-    config = {
-        "configurable": {"thread_id": thread_id},
-        "recursion_limit": 50
-    }
+    Args:
+        question: The user's question
+        thread_id: Unique ID for the conversation thread (maintains history);
+            None runs the question standalone without keeping any memory
+        now: Reference time for relative dates (defaults to the current time)
     
+    Returns:
+        AgentState with the final answer, plus "query_table" (Arrow table or None)
+
+    Raises:
+        LLMSchedulerError: The LLM queue is saturated; retry after e.retry_after
+    """
     try:
-        # Invoke the graph with memory-enabled config
-        final_state = text2sql_graph.invoke(initial_state, config=config)
+        with thread_turn(thread_id):
+            graph, initial_state, config = _prepare_run(question, thread_id, now)
+            final_state = graph.invoke(initial_state, config=config)
+        # Attach the Arrow result by reference for rendering (never checkpointed)
+        final_state["query_table"] = get_result_table(final_state, config)
         return final_state
         
+    except LLMSchedulerError:
+        # Overload is the caller's to surface (e.g. HTTP 429/503 with Retry-After)
+        raise
     except Exception as e:
         return {
             "error": str(e),
@@ -467,6 +701,43 @@ def run_text2sql_workflow(question: str, thread_id: str = None) -> AgentState:
         }
 
 
+def stream_text2sql_workflow(question: str, thread_id: str = None, now: datetime = None):
+    """Run the workflow, yielding (node_name, node_update) as each node finishes
+
+    Updates from executer_agent and the last item, ("__end__", final_state),
+    carry "query_table" as in run_text2sql_workflow. Errors propagate to the
+    caller.
+    """
+    with thread_turn(thread_id):
+        graph, initial_state, config = _prepare_run(question, thread_id, now)
+
+        final_state = initial_state
+        for mode, chunk in graph.stream(initial_state, config=config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+            else:
+                for node, update in chunk.items():
+                    if node == "executer_agent":
+                        update = {**update, "query_table": get_result_table(update, config)}
+                    yield node, update
+
+    final_state = dict(final_state)
+    final_state["query_table"] = get_result_table(final_state, config)
+    yield "__end__", final_state
+
+
+def warm_question(question: str, now: datetime = None) -> AgentState:
+    """Run a standalone question through the stateless graph to populate the caches"""
+    if now is None:
+        now = datetime.now()
+    # Warm-up must never delay interactive users' LLM calls
+    with llm_scheduler.priority(PRIORITY_BATCH):
+        return stateless_graph.invoke(
+            create_initial_state(question, now),
+            config={"configurable": {"result_tables": {}}, "recursion_limit": 50},
+        )
+
+
 def main():
     """Main function with LangGraph memory-based conversation"""
     
@@ -498,7 +769,11 @@ def main():
             continue
         
         # Run workflow with LangGraph memory (thread_id maintains conversation)
-        result = run_text2sql_workflow(user_question, thread_id)
+        try:
+            result = run_text2sql_workflow(user_question, thread_id)
+        except LLMSchedulerError as e:
+            print(f"\nAssistant: I'm busy right now, please try again in about {int(e.retry_after) + 1} seconds.\n")
+            continue
         
         final_answer = result.get("final_answer", "No response generated.")
         
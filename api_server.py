@@ -0,0 +1,410 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+
+from ai_agent import llm_scheduler, stream_text2sql_workflow
+from llm_scheduler import LLMQueueFullError, LLMSchedulerError
+from cache_warmer import create_cache_warmer
+from query_cache import normalize_question
+
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+# Runs allowed to wait for a worker; beyond this new questions get a 503
+API_MAX_PENDING = int(os.getenv("API_MAX_PENDING", "16"))
+REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "120"))
+SSE_KEEPALIVE = 15.0
+# Retry-After (seconds) sent with 503 when the worker pool is saturated
+BUSY_RETRY_AFTER = 5
+
+
+class ServerBusyError(Exception):
+    """Every worker is busy and the pending queue is full"""
+
+
+class RunTimeoutError(Exception):
+    """A subscriber gave up waiting for a run"""
+
+
+class SharedRun:
+    """One workflow execution whose events fan out to every subscriber
+
+    Events are kept for the lifetime of the run, so a subscriber that joins
+    late still replays them from the start.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.events: list[tuple[str, dict]] = []
+        self.result: Optional[dict] = None
+        self.error: Optional[Exception] = None
+        self.done = False
+        self.started = False
+        self.cancelled = False
+        self.subscribers = 1
+
+    def join(self) -> bool:
+        """Subscribe to the run; False if it was cancelled before starting"""
+        with self._cond:
+            if self.cancelled or self.done:
+                return False
+            self.subscribers += 1
+            return True
+
+    def leave(self):
+        """Unsubscribe; a run nobody waits for anymore is dropped if not started"""
+        with self._cond:
+            self.subscribers -= 1
+            if self.subscribers <= 0 and not self.started:
+                self.cancelled = True
+
+    def start(self) -> bool:
+        """Mark the run as started by a worker; False if it was cancelled"""
+        with self._cond:
+            if self.cancelled:
+                return False
+            self.started = True
+            return True
+
+    def publish(self, event: str, payload: dict):
+        with self._cond:
+            self.events.append((event, payload))
+            self._cond.notify_all()
+
+    def finish(self, result: Optional[dict] = None, error: Optional[Exception] = None):
+        with self._cond:
+            self.result = result
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def events_since(self, index: int, timeout: float) -> tuple[list[tuple[str, dict]], bool]:
+        """Events after `index`, waiting up to `timeout` for one; returns (events, done)"""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > index or self.done, timeout=timeout)
+            return self.events[index:], self.done
+
+    def wait(self, timeout: float) -> dict:
+        """Block until the run finishes and return its result (or raise its error)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.done, timeout=timeout):
+                raise RunTimeoutError(f"No answer after {timeout:.0f}s")
+            if self.error is not None:
+                raise self.error
+            return self.result
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution
+
+    The first caller for a key (the leader) submits the work; callers that
+    arrive while it is still in flight subscribe to the same SharedRun. The
+    key is released as soon as the work finishes, so results are never
+    reused after the fact.
+
+    At most `max_workers + max_pending` runs are queued or running; beyond
+    that submit() raises ServerBusyError instead of growing the queue.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="text2sql")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, SharedRun] = {}
+
+    def submit(self, key: str, fn: Callable[..., Iterator[tuple[str, dict]]], *args) -> tuple[SharedRun, bool]:
+        """Return (run, shared); shared is True when joining an in-flight run
+
+        `fn(*args)` yields (event, payload) pairs and finally ("__end__", result).
+        """
+        with self._lock:
+            run = self._in_flight.get(key)
+            if run is not None and run.join():
+                return run, True
+            if not self._slots.acquire(blocking=False):
+                raise ServerBusyError("All workers are busy")
+            run = SharedRun()
+            self._in_flight[key] = run
+        self._executor.submit(self._execute, key, run, fn, args)
+        return run, False
+
+    def _execute(self, key: str, run: SharedRun, fn: Callable, args: tuple):
+        try:
+            if not run.start():
+                # Every subscriber timed out while the run was still queued
+                run.finish(error=RunTimeoutError("Cancelled before it started"))
+                return
+            result = None
+            try:
+                for event, payload in fn(*args):
+                    if event == "__end__":
+                        result = payload
+                    else:
+                        run.publish(event, payload)
+            except Exception as e:
+                run.finish(error=e)
+            else:
+                run.finish(result=result)
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is run:
+                    del self._in_flight[key]
+            self._slots.release()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+single_flight = SingleFlight(API_WORKERS, API_MAX_PENDING)
+
+
+def coalescing_key(question: str, thread_id: Optional[str]) -> str:
+    """Stateless questions coalesce on the text alone; session questions only
+    with the same session, since their answer depends on its history"""
+    return f"{thread_id or ''}\x00{normalize_question(question)}"
+
+
+# Node -> (SSE event, state fields sent with it)
+NODE_EVENTS = {
+    "temporal_agent": ("dates", ["today", "date_start", "date_end", "date_expression", "date_exact"]),
+    "duckdbsql_agent": ("sql", ["sql_query"]),
+    "executer_agent": ("rows", ["error"]),
+    "analysis_agent": ("answer", ["final_answer"]),
+}
+
+
+def workflow_events(question: str, thread_id: Optional[str]) -> Iterator[tuple[str, dict]]:
+    """Map per-node workflow updates to JSON-safe (event, payload) pairs"""
+    try:
+        for node, update in stream_text2sql_workflow(question, thread_id):
+            if node == "__end__":
+                yield node, update
+                continue
+            if node not in NODE_EVENTS:
+                continue
+            event, fields = NODE_EVENTS[node]
+            payload = {field: update.get(field, "") for field in fields}
+            if event == "rows":
+                table = update.get("query_table")
+                payload["row_count"] = table.num_rows if table is not None else 0
+            yield event, payload
+    except LLMSchedulerError:
+        raise
+    except Exception as e:
+        yield "__end__", {
+            "error": str(e),
+            "final_answer": f"An error occurred while processing your question: {str(e)}",
+        }
+
+
+def submit_question(question: str, thread_id: Optional[str]) -> tuple[SharedRun, bool]:
+    """Run a question on the worker pool, sharing any identical in-flight run
+
+    Requests without a thread_id run on the stateless graph and leave no
+    conversation memory behind. Different questions on one thread_id run
+    one turn at a time (ai_agent.thread_turn).
+    """
+    return single_flight.submit(coalescing_key(question, thread_id), workflow_events, question, thread_id)
+
+
+def format_result(result: dict, thread_id: Optional[str], shared: bool) -> dict:
+    """JSON-safe subset of the final AgentState"""
+    table = result.get("query_table")
+    return {
+        "thread_id": thread_id,
+        "answer": result.get("final_answer", ""),
+        "sql_query": result.get("sql_query", ""),
+        # Rows are serialized from the Arrow table only here, for the HTTP response
+        "query_result": table.to_pylist() if table is not None else result.get("query_result", ""),
+        "error": result.get("error", ""),
+        "coalesced": shared,
+    }
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """HTTP/JSON and SSE endpoints over run_text2sql_workflow
+
+    POST /chat          {"question": ..., "thread_id": optional} -> JSON answer
+    POST /chat/stream   same body -> text/event-stream
+                        (accepted, dates, sql, rows, answer, result, done)
+    POST /threads       -> {"thread_id": ...} for a new conversation
+    GET  /health        -> worker/in-flight status and LLM queue metrics
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: dict, retry_after: Optional[float] = None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(max(int(retry_after + 0.999), 1)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_request(self) -> Optional[tuple[str, Optional[str]]]:
+        """Parse and validate the chat request body, replying 400 on failure"""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Request body must be valid JSON"})
+            return None
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return None
+
+        question = str(body.get("question", "")).strip()
+        thread_id = body.get("thread_id") or None
+        if not question:
+            self._send_json(400, {"error": "'question' is required"})
+            return None
+        return question, thread_id
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "workers": API_WORKERS,
+                "in_flight": single_flight.in_flight(),
+                "llm": llm_scheduler.metrics(),
+            })
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path == "/threads":
+            self._send_json(200, {"thread_id": str(uuid.uuid4())})
+        elif self.path == "/chat":
+            self._handle_chat()
+        elif self.path == "/chat/stream":
+            self._handle_chat_stream()
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _handle_chat(self):
+        request = self._read_request()
+        if request is None:
+            return
+        question, thread_id = request
+
+        run = self._submit(question, thread_id)
+        if run is None:
+            return
+        run, shared = run
+        try:
+            result = run.wait(timeout=REQUEST_TIMEOUT)
+        except RunTimeoutError:
+            run.leave()
+            self._send_json(504, {"error": "Timed out waiting for an answer", "thread_id": thread_id})
+            return
+        except LLMSchedulerError as e:
+            # Queue full -> 429, waited too long for an LLM slot -> 503
+            status = 429 if isinstance(e, LLMQueueFullError) else 503
+            self._send_json(status, {"error": str(e), "thread_id": thread_id}, retry_after=e.retry_after)
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e), "thread_id": thread_id})
+            return
+
+        self._send_json(200, format_result(result, thread_id, shared))
+
+    def _submit(self, question: str, thread_id: Optional[str]) -> Optional[tuple[SharedRun, bool]]:
+        """submit_question, replying 503 when the worker pool is saturated"""
+        try:
+            return submit_question(question, thread_id)
+        except ServerBusyError as e:
+            self._send_json(503, {"error": str(e), "thread_id": thread_id}, retry_after=BUSY_RETRY_AFTER)
+            return None
+
+    def _send_event(self, event: str, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _handle_chat_stream(self):
+        request = self._read_request()
+        if request is None:
+            return
+        question, thread_id = request
+
+        run = self._submit(question, thread_id)
+        if run is None:
+            return
+        run, shared = run
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            self._send_event("accepted", {"thread_id": thread_id, "coalesced": shared})
+            sent = 0
+            deadline = time.monotonic() + REQUEST_TIMEOUT
+            while True:
+                events, done = run.events_since(sent, timeout=min(SSE_KEEPALIVE, max(deadline - time.monotonic(), 0.0)))
+                for event, payload in events:
+                    self._send_event(event, payload)
+                sent += len(events)
+                if done:
+                    break
+                if time.monotonic() >= deadline:
+                    run.leave()
+                    self._send_event("error", {"error": "Timed out waiting for an answer"})
+                    return
+                if not events:
+                    # Comment line keeps proxies from closing an idle stream
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+            try:
+                result = run.wait(timeout=0)
+            except LLMSchedulerError as e:
+                self._send_event("error", {"error": str(e), "retry_after": e.retry_after})
+                return
+            except Exception as e:
+                self._send_event("error", {"error": str(e)})
+                return
+            self._send_event("result", format_result(result, thread_id, shared))
+            self._send_event("done", {})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; the shared execution keeps running for others
+            run.leave()
+
+    def log_message(self, format, *args):
+        print(f"API - {self.address_string()} - {format % args}")
+
+
+def main():
+    """Start the headless API server"""
+    server = ThreadingHTTPServer((API_HOST, API_PORT), APIHandler)
+    # Pre-warm caches for frequent questions on data reloads and day rollover
+    warmer = create_cache_warmer()
+    warmer.start()
+    print(f"\n🩸 Blood Donation Events API listening on http://{API_HOST}:{API_PORT}")
+    print(f"Workers: {API_WORKERS}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        warmer.stop()
+        server.server_close()
+        single_flight.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional, TypedDict
+
+
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "20"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+WARMUP_RATE_PER_MINUTE = float(os.getenv("WARMUP_RATE_PER_MINUTE", "10"))
+WARMUP_CHECK_INTERVAL = float(os.getenv("WARMUP_CHECK_INTERVAL", "60"))
+
+
+class WarmupReport(TypedDict):
+    """Outcome of one warm-up run"""
+    reason: str  # "startup", "data_reload", "day_rollover" or "manual"
+    started_at: str
+    questions: int
+    warmed: int
+    failed: int
+    duration_seconds: float
+
+
+class CacheWarmer:
+    """Replay frequent questions after a data reload or day rollover
+
+    Everything time-related goes through `clock` and `sleep`, so tests can
+    drive the scheduler with a fake clock instead of waiting.
+
+    Args:
+        warm_fn: Runs one question at the given time, populating the caches
+        top_questions_fn: Returns the N most frequent questions
+        data_version_fn: Returns a value that changes when the data is reloaded
+        reload_fn: Called before warming after a data reload (e.g. to refresh
+            cached schema statistics)
+        top_n: Number of questions to replay per run
+        max_concurrency: Questions warmed in parallel
+        rate_per_minute: Upper bound on questions started per minute
+        clock: Returns the current time as a UNIX timestamp
+        sleep: Blocks for the given number of seconds
+    """
+
+    def __init__(
+        self,
+        warm_fn: Callable[[str, datetime], object],
+        top_questions_fn: Callable[[int], list[str]],
+        data_version_fn: Callable[[], str],
+        reload_fn: Optional[Callable[[], object]] = None,
+        top_n: int = WARMUP_TOP_N,
+        max_concurrency: int = WARMUP_CONCURRENCY,
+        rate_per_minute: float = WARMUP_RATE_PER_MINUTE,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.warm_fn = warm_fn
+        self.top_questions_fn = top_questions_fn
+        self.data_version_fn = data_version_fn
+        self.reload_fn = reload_fn
+        self.top_n = top_n
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+
+        self.last_report: Optional[WarmupReport] = None
+        self._warmed_version: Optional[str] = None
+        self._warmed_day: Optional[str] = None
+        self._next_slot = 0.0
+        self._slot_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._reload_requested = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock())
+
+    def _wait_for_slot(self):
+        """Block until the rate budget allows starting another question"""
+        with self._slot_lock:
+            now = self.clock()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.min_interval
+        if start > now:
+            self.sleep(start - now)
+
+    def _warm_one(self, question: str) -> bool:
+        self._wait_for_slot()
+        try:
+            self.warm_fn(question, self._now())
+            return True
+        except Exception as e:
+            print(f"DEBUG - Warm-up failed for {repr(question)}: {e}")
+            return False
+
+    def pending_reason(self) -> Optional[str]:
+        """Why a warm-up is due now, or None if the caches are current"""
+        if self._reload_requested.is_set():
+            return "data_reload"
+        if self._warmed_version is None:
+            return "startup"
+        if self.data_version_fn() != self._warmed_version:
+            return "data_reload"
+        if self._now().strftime("%Y-%m-%d") != self._warmed_day:
+            return "day_rollover"
+        return None
+
+    def warm(self, reason: str = "manual") -> WarmupReport:
+        """Replay the top-N questions now and return a timing report"""
+        with self._run_lock:
+            self._reload_requested.clear()
+            if reason == "data_reload" and self.reload_fn is not None:
+                self.reload_fn()
+            # Recorded before the run so changes during it trigger another one
+            version = self.data_version_fn()
+            started = self.clock()
+            questions = self.top_questions_fn(self.top_n)
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="warmup") as pool:
+                outcomes = list(pool.map(self._warm_one, questions))
+
+            report = WarmupReport(
+                reason=reason,
+                started_at=datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+                questions=len(questions),
+                warmed=sum(outcomes),
+                failed=len(outcomes) - sum(outcomes),
+                duration_seconds=round(self.clock() - started, 3),
+            )
+            self._warmed_version = version
+            self._warmed_day = datetime.fromtimestamp(started).strftime("%Y-%m-%d")
+            self.last_report = report
+
+        print(
+            f"Cache warm-up ({reason}): {report['warmed']}/{report['questions']} questions "
+            f"in {report['duration_seconds']}s, {report['failed']} failed"
+        )
+        return report
+
+    def check(self) -> Optional[WarmupReport]:
+        """Run a warm-up if the data was reloaded or the day rolled over"""
+        reason = self.pending_reason()
+        if reason is None:
+            return None
+        return self.warm(reason)
+
+    def notify_reload(self):
+        """Signal that the dataset was refreshed; the background loop warms immediately"""
+        self._reload_requested.set()
+
+    def _run(self, interval: float):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"DEBUG - Cache warm-up check failed: {e}")
+            # Wake early when a reload is signalled
+            self._reload_requested.wait(timeout=interval)
+
+    def start(self, interval: float = WARMUP_CHECK_INTERVAL):
+        """Start checking for reloads/day rollover in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._reload_requested.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._reload_requested.clear()
+
+
+def create_cache_warmer(**kwargs) -> CacheWarmer:
+    """CacheWarmer wired to the Text2SQL workflow, query log and schema registry
+
+    The caches live in memory, so the warmer must run inside the process that
+    serves questions (the API server or the Streamlit app).
+    """
+    from ai_agent import schema_registry, warm_question
+    from query_cache import query_log
+
+    return CacheWarmer(
+        warm_fn=warm_question,
+        top_questions_fn=query_log.top_questions,
+        data_version_fn=schema_registry.data_version,
+        reload_fn=schema_registry.refresh_stale,
+        **kwargs,
+    )
+
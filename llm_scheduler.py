@@ -0,0 +1,314 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from openai import APIConnectionError
+
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "20"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "40000"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "50"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# First backoff (seconds) after a connection error or 5xx; doubles per retry
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+# Completion tokens assumed before the real usage is known
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "512"))
+
+# Priority for LLM calls made in the current context (e.g. inside a warm-up run)
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+class LLMSchedulerError(Exception):
+    """Base class for admission-control failures
+
+    Attributes:
+        retry_after: Suggested seconds before trying again
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMQueueFullError(LLMSchedulerError):
+    """The wait queue is at capacity (or the call was evicted by a higher-priority one)"""
+
+
+class LLMQueueTimeoutError(LLMSchedulerError):
+    """The request waited longer than its timeout without being admitted"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        # Never ask for more than the bucket can hold, or we would wait forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Correct an earlier estimate (positive = more was used); may go negative"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def estimate_tokens(messages: list[dict], completion: int = LLM_COMPLETION_ESTIMATE) -> int:
+    """Rough token estimate (~4 characters per token) for rate budgeting"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + completion
+
+
+class LLMScheduler:
+    """Central admission control for outbound LLM calls
+
+    Calls wait in a bounded priority queue and are admitted in priority
+    order (FIFO within a priority) when both the requests-per-minute and
+    tokens-per-minute buckets allow it. When the queue is full, a call
+    evicts the newest lowest-priority waiter if it outranks it and is
+    refused otherwise, so queued batch calls never lock out interactive
+    ones. A full queue or an expired wait raises instead of piling more
+    requests onto the provider, and a 429 pauses admission for the
+    provider's Retry-After before retrying. Connection errors and 5xx
+    responses are retried with exponential backoff, within the same retry
+    budget and deadline.
+
+    The client should be built with max_retries=0 so retries happen only
+    here, where they are admission-controlled and a 429 pause applies to
+    every queued call.
+
+    Args:
+        client: OpenAI-compatible client (only chat.completions.create is used)
+        requests_per_minute: Request bucket refill rate
+        tokens_per_minute: Token bucket refill rate
+        max_queue: Maximum number of waiting calls
+        queue_timeout: Default seconds a call may wait for admission
+        max_retries: Retries after a 429, 5xx or connection error
+        clock: Monotonic time source, injectable for tests
+        sleep: Blocks for the given number of seconds, injectable for tests
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock)
+
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []  # (priority, sequence)
+        self._evicted: set[tuple[int, int]] = set()
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+        self._waits: dict[int, deque] = {}
+        self._counters = {"admitted": 0, "completed": 0, "failed": 0, "rejected": 0, "evicted": 0, "timed_out": 0, "rate_limited": 0, "transient_errors": 0}
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Run LLM calls in this block (and this thread's context) at `priority`"""
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    def _admission_wait(self, tokens: int) -> float:
+        return max(
+            self._paused_until - self.clock(),
+            self.request_bucket.wait_time(1),
+            self.token_bucket.wait_time(tokens),
+            0.0,
+        )
+
+    def _retry_estimate(self) -> float:
+        """Rough seconds until the current queue drains (caller holds the lock)"""
+        per_request = 1.0 / self.request_bucket.rate if self.request_bucket.rate > 0 else self.queue_timeout
+        return max(self._paused_until - self.clock(), 0.0) + len(self._queue) * per_request
+
+    def _remove(self, ticket: tuple[int, int]):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def acquire(self, tokens: int, priority: int, timeout: float) -> float:
+        """Block until admitted; returns the time spent queued in seconds"""
+        enqueued = self.clock()
+        deadline = enqueued + timeout
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                # Newest entry of the lowest priority goes first
+                lowest = max(self._queue) if self._queue else None
+                if lowest is None or lowest[0] <= priority:
+                    self._counters["rejected"] += 1
+                    raise LLMQueueFullError(
+                        f"LLM queue is full ({self.max_queue} waiting)",
+                        retry_after=self._retry_estimate(),
+                    )
+                self._evicted.add(lowest)
+                self._remove(lowest)
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+
+            while True:
+                if ticket in self._evicted:
+                    self._evicted.discard(ticket)
+                    self._counters["evicted"] += 1
+                    raise LLMQueueFullError(
+                        "Evicted from the LLM queue by a higher-priority call",
+                        retry_after=self._retry_estimate(),
+                    )
+
+                wait = None
+                if self._queue[0] == ticket:
+                    wait = self._admission_wait(tokens)
+                    if wait <= 0:
+                        self.request_bucket.take(1)
+                        self.token_bucket.take(tokens)
+                        heapq.heappop(self._queue)
+                        self._counters["admitted"] += 1
+                        # Let the next caller in line re-check the buckets
+                        self._cond.notify_all()
+                        break
+
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._counters["timed_out"] += 1
+                    raise LLMQueueTimeoutError(
+                        f"Waited {timeout:.1f}s for an LLM slot",
+                        retry_after=self._retry_estimate(),
+                    )
+                # Head of the queue sleeps until the buckets refill; the
+                # rest wake when the head is admitted or leaves
+                self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+
+        waited = self.clock() - enqueued
+        with self._cond:
+            self._waits.setdefault(priority, deque(maxlen=1000)).append(waited)
+        return waited
+
+    def _pause(self, seconds: float):
+        """Hold admission after a 429 so queued calls don't hit the limit too"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._counters["rate_limited"] += 1
+
+    def chat_completion(
+        self,
+        priority: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ):
+        """Admission-controlled client.chat.completions.create(**kwargs)"""
+        if priority is None:
+            priority = _current_priority.get()
+        if timeout is None:
+            timeout = self.queue_timeout
+        estimated = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens") or LLM_COMPLETION_ESTIMATE)
+        deadline = self.clock() + timeout
+
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated, priority, max(deadline - self.clock(), 0.0))
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if getattr(e, "status_code", None) == 429 and attempt < self.max_retries:
+                    retry_after = _retry_after(e)
+                    print(f"DEBUG - LLM rate limited, pausing admission for {retry_after}s")
+                    self._pause(retry_after)
+                    continue
+                backoff = LLM_RETRY_BACKOFF * 2 ** attempt
+                if _is_transient(e) and attempt < self.max_retries and self.clock() + backoff < deadline:
+                    print(f"DEBUG - LLM call failed ({e}), retrying in {backoff}s")
+                    with self._cond:
+                        self._counters["transient_errors"] += 1
+                    self.sleep(backoff)
+                    continue
+                with self._cond:
+                    self._counters["failed"] += 1
+                raise
+
+            # Charge the token bucket with what the call actually used
+            usage = getattr(response, "usage", None)
+            total_tokens = getattr(usage, "total_tokens", None)
+            with self._cond:
+                if total_tokens:
+                    self.token_bucket.adjust(total_tokens - estimated)
+                self._counters["completed"] += 1
+            return response
+
+    def metrics(self) -> dict:
+        """Queue depth, counters and queue-wait stats per priority"""
+        with self._cond:
+            waits = {}
+            for priority, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[priority] = {
+                    "count": len(ordered),
+                    "avg_seconds": round(sum(ordered) / len(ordered), 3),
+                    "p95_seconds": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+                    "max_seconds": round(ordered[-1], 3),
+                }
+            return {"queued": len(self._queue), **self._counters, "queue_wait": waits}
+
+
+def _is_transient(error: Exception) -> bool:
+    """Connection failures/timeouts and 5xx responses, worth retrying"""
+    if isinstance(error, APIConnectionError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+def _retry_after(error: Exception, default: float = 5.0) -> float:
+    """Retry-After header of a 429 response, in seconds"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", default)), 0.0)
+    except (TypeError, ValueError):
+        return default
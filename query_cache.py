@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable, Optional
+
+
+QUERY_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_log.jsonl")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form used to detect identical questions"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a tuple of JSON-serialisable parts"""
+    raw = json.dumps(parts, ensure_ascii=False, default=str, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe LRU cache
+
+    Keys include the data version and reference date, so entries for an
+    old dataset or an old day simply stop being hit and age out.
+
+    Args:
+        max_size: Maximum number of entries
+        max_bytes: Optional cap on the total of sizeof(value); a value larger
+            than the cap on its own is not cached
+        sizeof: Size of a value in bytes (required with max_bytes)
+    """
+
+    def __init__(self, max_size: int = 512, max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key: str, value: Any):
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while len(self._data) > self.max_size or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key: str):
+        """Remove an entry if present (caller holds the lock)"""
+        if key in self._data:
+            del self._data[key]
+            self.bytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Generated SQL per (question, date, data version) for questions without history
+sql_cache = LRUCache(max_size=512)
+# Arrow result tables per (resolved SQL, data version); AgentState holds the key
+result_cache = LRUCache(max_size=256, max_bytes=RESULT_CACHE_MAX_BYTES, sizeof=lambda table: table.nbytes)
+# Final answers per (question, date, result) for questions without history
+answer_cache = LRUCache(max_size=512)
+
+
+class QueryLog:
+    """JSONL log of asked questions, used to pick questions to pre-warm
+
+    Only the last `window` entries are ever read, so once the file holds
+    twice that many it is truncated to the last `window` entries.
+    """
+
+    def __init__(self, path: str = QUERY_LOG_PATH, window: int = 5000):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._entries: Optional[int] = None
+
+    def _count_entries(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _truncate(self):
+        """Keep only the last `window` entries (caller holds the lock)"""
+        with open(self.path, encoding="utf-8") as f:
+            entries = deque((line for line in f if line.strip()), maxlen=self.window)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(entries)
+        os.replace(tmp_path, self.path)
+        self._entries = len(entries)
+
+    def append(self, question: str, timestamp: Optional[float] = None):
+        entry = {"ts": timestamp if timestamp is not None else time.time(), "question": question.strip()}
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._count_entries()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries += 1
+            if self._entries >= 2 * self.window:
+                self._truncate()
+
+    def top_questions(self, n: int = 20) -> list[str]:
+        """Most frequent questions among the last `window` entries
+
+        Questions are grouped by normalized text; the most recent phrasing
+        of each group is returned.
+        """
+        if not os.path.exists(self.path):
+            return []
+        with self._lock:
+            with open(self.path, encoding="utf-8") as f:
+                entries = deque((line for line in f if line.strip()), maxlen=self.window)
+
+        counts = Counter()
+        phrasing = {}
+        for line in entries:
+            try:
+                question = json.loads(line)["question"]
+            except (ValueError, KeyError):
+                continue
+            key = normalize_question(question)
+            counts[key] += 1
+            phrasing[key] = question
+        return [phrasing[key] for key, _ in counts.most_common(n)]
+
+
+query_log = QueryLog()
@@ -0,0 +1,260 @@
+import os
+import re
+import threading
+from typing import Optional, TypedDict
+
+import duckdb
+
+
+class ColumnInfo(TypedDict):
+    """Introspected column with cached statistics"""
+    name: str
+    type: str
+    description: str
+    keywords: list[str]
+    distinct: int
+    min_value: str
+    max_value: str
+    samples: list[str]
+
+
+class TableInfo(TypedDict):
+    """A registered data source"""
+    name: str  # Name used in SQL (e.g. blood_donation_events.csv)
+    path: str  # File DuckDB actually reads
+    description: str
+    keywords: list[str]
+    core_columns: list[str]  # Always included when the table is in the prompt
+    column_descriptions: dict[str, str]
+    column_keywords: dict[str, list[str]]
+
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "of", "in", "on", "at", "for", "to", "and", "or", "me", "show",
+    "what", "which", "how", "many", "much", "list", "all", "any", "there", "i", "my",
+    "yang", "di", "ada", "apa", "berapa", "senarai", "semua", "dan", "atau", "ke", "untuk", "saya",
+}
+
+
+# Text columns with more distinct values than this get no sample values
+MAX_SAMPLE_CARDINALITY = 100
+
+
+def _tokens(text: str) -> set[str]:
+    """Lowercase word tokens without stopwords; snake_case names are split too"""
+    return {t for t in re.findall(r"[a-z0-9]+", text.lower().replace("_", " ")) if t not in STOPWORDS}
+
+
+class SchemaRegistry:
+    """Registry of queryable sources with introspected, cached schema metadata"""
+
+    def __init__(self, sample_size: int = 3):
+        self.sample_size = sample_size
+        self._tables: dict[str, TableInfo] = {}
+        # name -> (file mtime, introspected columns)
+        self._columns: dict[str, tuple[float, list[ColumnInfo]]] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        path: str,
+        description: str = "",
+        keywords: Optional[list[str]] = None,
+        core_columns: Optional[list[str]] = None,
+        column_descriptions: Optional[dict[str, str]] = None,
+        column_keywords: Optional[dict[str, list[str]]] = None,
+        introspect: bool = True,
+    ):
+        """Register a file-backed table under the name the LLM should use in SQL
+
+        The source is introspected here (unless introspect=False) so the
+        first question doesn't pay for it.
+        """
+        with self._lock:
+            self._tables[name] = TableInfo(
+                name=name,
+                path=path,
+                description=description,
+                keywords=keywords or [],
+                core_columns=core_columns or [],
+                column_descriptions=column_descriptions or {},
+                column_keywords=column_keywords or {},
+            )
+            self._columns.pop(name, None)
+        if introspect:
+            try:
+                self.columns(name)
+            except Exception as e:
+                # Retried lazily on first use
+                print(f"DEBUG - Could not introspect {name}: {e}")
+
+    @property
+    def tables(self) -> list[str]:
+        return list(self._tables)
+
+    def path(self, name: str) -> str:
+        return self._tables[name]["path"]
+
+    def refresh(self, name: Optional[str] = None):
+        """Drop cached column stats (all tables, or one) so they are re-introspected"""
+        with self._lock:
+            if name is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(name, None)
+
+    def refresh_stale(self) -> list[str]:
+        """Re-introspect tables whose file changed since they were introspected
+
+        Called off the request path (e.g. by the cache warmer after a data
+        reload); questions keep using the cached stats until then.
+        """
+        refreshed = []
+        for name, table in list(self._tables.items()):
+            with self._lock:
+                cached = self._columns.get(name)
+            if cached and cached[0] == os.path.getmtime(table["path"]):
+                continue
+            mtime = os.path.getmtime(table["path"])
+            columns = self._introspect(table)
+            with self._lock:
+                self._columns[name] = (mtime, columns)
+            refreshed.append(name)
+        return refreshed
+
+    def data_version(self) -> str:
+        """Changes whenever any registered file is replaced or modified"""
+        parts = []
+        for name, table in self._tables.items():
+            try:
+                parts.append(f"{name}:{os.path.getmtime(table['path'])}")
+            except OSError:
+                parts.append(f"{name}:missing")
+        return "|".join(parts)
+
+    def _introspect(self, table: TableInfo) -> list[ColumnInfo]:
+        """Collect column types and stats with one SUMMARIZE pass, plus one
+        approx_top_k pass for the sample values of low-cardinality text columns"""
+        source = f"'{table['path']}'"
+        con = duckdb.connect()
+        try:
+            summary = con.sql(f"SUMMARIZE SELECT * FROM {source}").fetchall()
+            # column_name, column_type, min, max, approx_unique, ..., count, null_percentage
+            sampled = [
+                row[0] for row in summary
+                if row[1] == "VARCHAR" and (row[4] or 0) <= MAX_SAMPLE_CARDINALITY
+            ]
+            samples = {}
+            if sampled:
+                selects = ", ".join(f'approx_top_k("{name}", {self.sample_size})' for name in sampled)
+                top_values = con.sql(f"SELECT {selects} FROM {source}").fetchone()
+                samples = dict(zip(sampled, top_values))
+
+            columns = []
+            for name, col_type, min_value, max_value, distinct, *_ in summary:
+                values = [str(v) for v in samples.get(name) or [] if v is not None]
+                # URLs are long and all share one prefix; they tell the LLM nothing
+                if any(v.startswith(("http://", "https://")) for v in values):
+                    values = []
+                columns.append(ColumnInfo(
+                    name=name,
+                    type=col_type,
+                    description=table["column_descriptions"].get(name, ""),
+                    keywords=table["column_keywords"].get(name, []),
+                    distinct=int(distinct or 0),
+                    min_value="" if min_value is None else str(min_value),
+                    max_value="" if max_value is None else str(max_value),
+                    samples=values,
+                ))
+            return columns
+        finally:
+            con.close()
+
+    def columns(self, name: str) -> list[ColumnInfo]:
+        """Introspected columns for a table (introspected now if never done)"""
+        with self._lock:
+            cached = self._columns.get(name)
+        if cached:
+            return cached[1]
+        table = self._tables[name]
+        mtime = os.path.getmtime(table["path"])
+        columns = self._introspect(table)
+        with self._lock:
+            self._columns[name] = (mtime, columns)
+        return columns
+
+    def _column_score(self, column: ColumnInfo, question_tokens: set[str]) -> int:
+        text = " ".join([column["name"], column["description"], *column["keywords"], *column["samples"]])
+        return len(question_tokens & _tokens(text))
+
+    def _column_tokens(self, table: TableInfo, question_tokens: set[str]) -> set[str]:
+        """Question tokens that can select columns: the table's name and
+        keywords ("event", "blood") say which table, not which column"""
+        return question_tokens - _tokens(" ".join([table["name"], *table["keywords"]]))
+
+    def _table_score(self, table: TableInfo, question_tokens: set[str]) -> int:
+        text = " ".join([table["name"], table["description"], *table["keywords"]])
+        score = len(question_tokens & _tokens(text))
+        column_tokens = self._column_tokens(table, question_tokens)
+        for column in self.columns(table["name"]):
+            score += self._column_score(column, column_tokens)
+        return score
+
+    def relevant_schema(self, question: str, max_tables: int = 2, max_columns: int = 12) -> dict[str, list[ColumnInfo]]:
+        """Pick the tables and columns most relevant to a question
+
+        Tables with no overlap are dropped (the first registered table is the
+        fallback). Within a table, core columns are always kept and other
+        columns only when the question matches them, up to max_columns.
+        Tables without core columns keep their best-matching columns.
+        """
+        question_tokens = _tokens(question)
+        scored = [(self._table_score(t, question_tokens), i, t) for i, t in enumerate(self._tables.values())]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        selected = [t for score, _, t in scored if score > 0][:max_tables]
+        if not selected and scored:
+            selected = [min(scored, key=lambda x: x[1])[2]]
+
+        schema = {}
+        for table in selected:
+            columns = self.columns(table["name"])
+            column_tokens = self._column_tokens(table, question_tokens)
+            scores = {c["name"]: self._column_score(c, column_tokens) for c in columns}
+            core = table["core_columns"]
+            if core:
+                candidates = [c for c in columns if c["name"] in core or scores[c["name"]] > 0]
+            else:
+                candidates = columns
+            ranked = sorted(candidates, key=lambda c: (c["name"] not in core, -scores[c["name"]]))
+            keep = {c["name"] for c in ranked[:max_columns]}
+            schema[table["name"]] = [c for c in columns if c["name"] in keep]
+        return schema
+
+    def schema_text(self, question: str, max_tables: int = 2, max_columns: int = 12) -> str:
+        """Compact schema description of the relevant tables for an LLM prompt"""
+        lines = []
+        for name, columns in self.relevant_schema(question, max_tables, max_columns).items():
+            table = self._tables[name]
+            lines.append(f"Table: {name} (NO quotes)")
+            if table["description"]:
+                lines.append(table["description"])
+            for column in columns:
+                line = f"- {column['name']} ({column['type']})"
+                if column["description"]:
+                    line += f": {column['description']}"
+                if column["type"] == "VARCHAR":
+                    samples = ", ".join(f"'{s[:40]}'" for s in column["samples"])
+                    line += f" e.g. {samples}" if samples else ""
+                elif column["min_value"]:
+                    line += f" [{column['min_value']} .. {column['max_value']}]"
+                lines.append(line)
+            lines.append("")
+        return "\n".join(lines).strip()
+
+    def resolve_table_refs(self, sql_query: str) -> str:
+        """Rewrite registered table names (quoted or not) to their file paths"""
+        for name, table in self._tables.items():
+            pattern = rf"""(?<![\w/\\.])(['"]?){re.escape(name)}\1(?![\w.])"""
+            sql_query = re.sub(pattern, lambda m: f"'{table['path']}'", sql_query)
+        return sql_query
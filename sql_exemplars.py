@@ -0,0 +1,158 @@
+import json
+import os
+import re
+import sys
+import threading
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+
+
+EXEMPLARS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_exemplars.jsonl")
+
+# Number of hashed feature buckets; short questions have a few dozen
+# features, so collisions stay rare while each row is only 16 KB.
+N_FEATURES = 2 ** 12
+
+
+def _tokenize(text: str) -> list[str]:
+    """Lowercase word tokens (works for English and Malay)"""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _features(text: str) -> list[str]:
+    """Word unigrams, word bigrams and character trigrams of a question"""
+    words = _tokenize(text)
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return features
+
+
+def vectorize(text: str) -> np.ndarray:
+    """Hash question features into an L2-normalised vector"""
+    vector = np.zeros(N_FEATURES, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode("utf-8")) % N_FEATURES] += 1.0
+    # Sublinear term frequency so repeated words don't dominate
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class ExemplarStore:
+    """Local store of verified question -> SQL pairs with a cosine-similarity index
+
+    Args:
+        path: JSONL file the pairs are loaded from and appended to
+        validate: Raises if a pair's SQL doesn't compile; such pairs are skipped
+    """
+
+    def __init__(self, path: str = EXEMPLARS_PATH, validate: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.validate = validate
+        self._lock = threading.Lock()
+        self._exemplars: list[dict] = []
+        # Preallocated rows, grown by doubling so inserts are amortised O(1)
+        self._matrix = np.zeros((16, N_FEATURES), dtype=np.float32)
+        self._load()
+
+    def _is_valid(self, exemplar: dict) -> bool:
+        if self.validate is None:
+            return True
+        try:
+            self.validate(exemplar["sql"])
+            return True
+        except Exception as e:
+            print(f"DEBUG - Skipping exemplar {repr(exemplar['question'])}: {e}")
+            return False
+
+    def _append(self, exemplar: dict):
+        """Add a pair to the in-memory index (caller holds the lock)"""
+        if len(self._exemplars) == len(self._matrix):
+            grown = np.zeros((2 * len(self._matrix), N_FEATURES), dtype=np.float32)
+            grown[:len(self._matrix)] = self._matrix
+            self._matrix = grown
+        self._matrix[len(self._exemplars)] = vectorize(exemplar["question"])
+        self._exemplars.append(exemplar)
+
+    def _load(self):
+        """Load exemplars from the JSONL file, if it exists"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                exemplar = json.loads(line)
+                if self._is_valid(exemplar):
+                    self._append(exemplar)
+
+    def __len__(self) -> int:
+        return len(self._exemplars)
+
+    def add(self, question: str, sql: str, persist: bool = True) -> bool:
+        """Add a verified pair to the index (and the JSONL file)
+
+        Returns:
+            False if the question is already stored or the SQL doesn't compile,
+            True otherwise
+        """
+        exemplar = {"question": question.strip(), "sql": sql.strip()}
+        if not self._is_valid(exemplar):
+            return False
+        with self._lock:
+            if any(e["question"].lower() == exemplar["question"].lower() for e in self._exemplars):
+                return False
+            self._append(exemplar)
+            if persist:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(exemplar, ensure_ascii=False) + "\n")
+        return True
+
+    def search(self, question: str, k: int = 3, min_score: float = 0.1) -> list[dict]:
+        """Return the top-k most similar exemplars with their cosine score"""
+        with self._lock:
+            if not self._exemplars:
+                return []
+            scores = self._matrix[:len(self._exemplars)] @ vectorize(question)
+            exemplars = self._exemplars
+        top = np.argsort(-scores)[:k]
+        return [
+            {**exemplars[i], "score": float(scores[i])}
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+
+def format_exemplars(exemplars: list[dict]) -> str:
+    """Format exemplars as a prompt block"""
+    if not exemplars:
+        return "No similar examples available."
+    return "\n".join(f"Q: {e['question']}\nSQL: {e['sql']}" for e in exemplars)
+
+
+def main():
+    """Add a verified question -> SQL pair from the command line"""
+    if len(sys.argv) != 3:
+        print('Usage: python sql_exemplars.py "<question>" "<sql>"')
+        sys.exit(1)
+
+    # Validates against the registered data sources before storing
+    from ai_agent import exemplar_store
+
+    if exemplar_store.add(sys.argv[1], sys.argv[2]):
+        print(f"✅ Added exemplar ({len(exemplar_store)} total)")
+    else:
+        print("❌ Not added: question already stored or SQL doesn't compile")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
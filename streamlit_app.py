@@ -2,6 +2,25 @@ import os
 from datetime import datetime
 import streamlit as st
 from ai_agent import run_text2sql_workflow
+from llm_scheduler import LLMSchedulerError
+from cache_warmer import create_cache_warmer
+
+
+@st.cache_resource
+def start_cache_warmer():
+    """One background warmer per Streamlit server process (shared by all sessions)"""
+    warmer = create_cache_warmer()
+    warmer.start()
+    return warmer
+
+
+def show_raw_results(raw_results):
+    """Render a result table directly from Arrow, or the status/error text"""
+    if isinstance(raw_results, str):
+        if raw_results:
+            st.text(raw_results)
+    else:
+        st.dataframe(raw_results)
 
 
 def main():
@@ -15,6 +34,9 @@ def main():
         initial_sidebar_state="expanded"
     )
     
+    # Pre-warm caches for frequent questions on data reloads and day rollover
+    start_cache_warmer()
+    
     # Custom CSS
     st.markdown("""
         <style>
@@ -114,9 +136,9 @@ def main():
                     st.code(message["sql_query"], language="sql")
             
             # Display raw results if available
-            if "raw_results" in message and show_results and message["raw_results"]:
+            if "raw_results" in message and show_results and message["raw_results"] is not None:
                 with st.expander("📋 Raw Results"):
-                    st.json(message["raw_results"])
+                    show_raw_results(message["raw_results"])
     
     # Chat input
     if prompt := st.chat_input("Ask about blood donation events..."):
@@ -141,12 +163,19 @@ def main():
         with st.chat_message("assistant"):
             with st.spinner("🔍 Analyzing your question..."):
                 # Run the workflow
-                result = run_text2sql_workflow(question)
+                try:
+                    result = run_text2sql_workflow(question)
+                except LLMSchedulerError as e:
+                    result = {
+                        "final_answer": f"⏳ I'm busy right now. Please try again in about {int(e.retry_after) + 1} seconds."
+                    }
                 
                 # Extract response
                 response = result.get("final_answer", "I couldn't process your question.")
                 sql_query = result.get("sql_query", "")
-                query_result = result.get("query_result", "")
+                # Arrow table by reference; status/error text when there are no rows
+                query_table = result.get("query_table")
+                raw_results = query_table if query_table is not None else result.get("query_result", "")
                 error = result.get("error", "")
                 
                 # Display error if any
@@ -162,20 +191,16 @@ def main():
                         st.code(sql_query, language="sql")
                 
                 # Show raw results if enabled
-                if show_results and query_result:
+                if show_results and raw_results is not None:
                     with st.expander("📋 Raw Results"):
-                        try:
-                            results_data = json.loads(query_result) if isinstance(query_result, str) else query_result
-                            st.json(results_data)
-                        except:
-                            st.text(query_result)
+                        show_raw_results(raw_results)
                 
                 # Add to chat history
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": response,
                     "sql_query": sql_query,
-                    "raw_results": query_result
+                    "raw_results": raw_results
                 })
 
 
@@ -0,0 +1,288 @@
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional, TypedDict
+
+
+class DateRange(TypedDict):
+    """Concrete, inclusive date range resolved from a temporal expression"""
+    start: str  # YYYY-MM-DD
+    end: str  # YYYY-MM-DD
+    expression: str  # Text matched in the question
+    # False when several separate expressions were merged into their overall span
+    exact: bool
+
+
+MONTHS = {
+    # English
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6,
+    "july": 7, "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    # Malay
+    "januari": 1, "februari": 2, "julai": 7, "ogos": 8, "oktober": 10, "disember": 12,
+}
+
+# Abbreviations, and the Malay names that are also words in place names
+# ("Jalan Dis", "10 Dec Street", "Jalan Mac Callum", "Jalan 3 Mei"), only
+# count next to a year or after "in"/"bulan"/"on <day>"/"from <day>".
+AMBIGUOUS_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "mac": 3, "apr": 4, "mei": 5, "jun": 6, "jul": 7,
+    "aug": 8, "sep": 9, "sept": 9, "oct": 10, "okt": 10, "nov": 11, "dec": 12, "dis": 12,
+}
+
+ALL_MONTHS = {**MONTHS, **AMBIGUOUS_MONTHS}
+
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "isnin": 0, "selasa": 1, "rabu": 2, "khamis": 3, "jumaat": 4, "sabtu": 5, "ahad": 6,
+}
+
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ALL_MONTH_NAMES = "|".join(sorted(ALL_MONTHS, key=len, reverse=True))
+# "may" is also an English modal verb, so it never matches as a bare month
+_BARE_MONTH_NAMES = "|".join(name for name in sorted(MONTHS, key=len, reverse=True) if name != "may")
+_WEEKDAY_NAMES = "|".join(WEEKDAYS)
+
+
+def _month_range(year: int, month: int) -> tuple[date, date]:
+    """First and last day of a month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _add_months(year: int, month: int, delta: int) -> tuple[int, int]:
+    """Shift (year, month) by a number of months"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def _week_range(today: date, weeks_ahead: int) -> tuple[date, date]:
+    """Monday-Sunday week; the current week starts today rather than on Monday"""
+    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=weeks_ahead)
+    start = max(monday, today) if weeks_ahead == 0 else monday
+    return start, monday + timedelta(days=6)
+
+
+def _weekend_range(today: date, weeks_ahead: int) -> tuple[date, date]:
+    """Saturday-Sunday weekend; the current weekend is clipped to today"""
+    saturday = today - timedelta(days=today.weekday()) + timedelta(days=5, weeks=weeks_ahead)
+    start = max(saturday, today) if weeks_ahead == 0 else saturday
+    return start, saturday + timedelta(days=1)
+
+
+def _year(text: Optional[str], today: date, month: int) -> int:
+    """Explicit year, or the next occurrence of the month (this year if not passed yet)"""
+    if text:
+        return int(text)
+    return today.year if month >= today.month else today.year + 1
+
+
+def _day_month_year(m: re.Match, today: date) -> tuple[date, date]:
+    month = ALL_MONTHS[m.group("month")]
+    day = date(_year(m.groupdict().get("year"), today, month), month, int(m.group("day")))
+    return day, day
+
+
+def _month_year(m: re.Match, today: date) -> tuple[date, date]:
+    month = ALL_MONTHS[m.group("month")]
+    return _month_range(_year(m.groupdict().get("year"), today, month), month)
+
+
+def _iso_date(m: re.Match, today: date) -> tuple[date, date]:
+    day = date(int(m.group("year")), int(m.group("month")), int(m.group("day")))
+    return day, day
+
+
+def _numeric_date(m: re.Match, today: date) -> tuple[date, date]:
+    # Malaysian convention: day/month/year
+    day = date(int(m.group("year")), int(m.group("month")), int(m.group("day")))
+    return day, day
+
+
+def _next_days(m: re.Match, today: date) -> tuple[date, date]:
+    n = int(m.group("n") or m.group("n_ms"))
+    return today, today + timedelta(days=max(n, 1) - 1)
+
+
+def _day_span(m: re.Match, today: date) -> tuple[date, date]:
+    """Day span within one month: 1-10 May, 1 to 10 May 2025, 1 hingga 10 Mei"""
+    month = ALL_MONTHS[m.group("month")]
+    year = _year(m.group("year"), today, month)
+    first, last = date(year, month, int(m.group("first"))), date(year, month, int(m.group("day")))
+    return min(first, last), max(first, last)
+
+
+def _weekday(m: re.Match, today: date) -> tuple[date, date]:
+    weekday = WEEKDAYS[m.group("weekday")]
+    if m.group("next") or m.group("next_ms"):
+        # "next Monday" / "Isnin depan": that day in next week's Monday-Sunday
+        day = today - timedelta(days=today.weekday()) + timedelta(weeks=1, days=weekday)
+    elif m.group("last") or m.group("last_ms"):
+        # "last Saturday" / "Sabtu lepas": the most recent one before today
+        day = today - timedelta(days=(today.weekday() - weekday - 1) % 7 + 1)
+    else:
+        day = today + timedelta(days=(weekday - today.weekday()) % 7)
+    return day, day
+
+
+def _fixed(offset: int) -> Callable[[re.Match, date], tuple[date, date]]:
+    def resolve(m: re.Match, today: date) -> tuple[date, date]:
+        day = today + timedelta(days=offset)
+        return day, day
+    return resolve
+
+
+def _month(delta: int) -> Callable[[re.Match, date], tuple[date, date]]:
+    def resolve(m: re.Match, today: date) -> tuple[date, date]:
+        return _month_range(*_add_months(today.year, today.month, delta))
+    return resolve
+
+
+def _rest_of_month(m: re.Match, today: date) -> tuple[date, date]:
+    return today, _month_range(today.year, today.month)[1]
+
+
+def _year_range(delta: int) -> Callable[[re.Match, date], tuple[date, date]]:
+    def resolve(m: re.Match, today: date) -> tuple[date, date]:
+        return date(today.year + delta, 1, 1), date(today.year + delta, 12, 31)
+    return resolve
+
+
+_ORDINAL = r"(?:st|nd|rd|th)?"
+# Words that make an ambiguous month name before them a date
+_DATE_CONTEXT = r"on|pada|from|dari|to|until|till|hingga|sehingga|sampai|between|antara|and|dan"
+
+# Ordered most specific first: "this weekend" must win over "this week",
+# "12 April 2025" over "April 2025", etc.
+PATTERNS: list[tuple[str, Callable[[re.Match, date], tuple[date, date]]]] = [
+    (r"(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})", _iso_date),
+    (r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4})", _numeric_date),
+    (
+        rf"(?P<first>\d{{1,2}}){_ORDINAL}\s*(?:-|–|to|until|till|hingga|sehingga|sampai)\s*"
+        rf"(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<month>{_ALL_MONTH_NAMES})(?:\s+(?P<year>\d{{4}}))?",
+        _day_span,
+    ),
+    (rf"(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<month>{_ALL_MONTH_NAMES})\s+(?P<year>\d{{4}})", _day_month_year),
+    (rf"(?:(?:on|pada)\s+)?(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<month>{_MONTH_NAMES})", _day_month_year),
+    (rf"(?:{_DATE_CONTEXT})\s+(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<month>{_ALL_MONTH_NAMES})", _day_month_year),
+    (rf"(?P<month>{_ALL_MONTH_NAMES})\s+(?P<year>\d{{4}})", _month_year),
+    (rf"(?:in|bulan)\s+(?P<month>{_ALL_MONTH_NAMES})", _month_year),
+    (rf"(?P<month>{_BARE_MONTH_NAMES})", _month_year),
+    (r"(?:next|coming)\s+weekend|hujung\s+minggu\s+(?:depan|hadapan)", lambda m, t: _weekend_range(t, 1)),
+    (r"last\s+weekend|hujung\s+minggu\s+(?:lepas|lalu)", lambda m, t: _weekend_range(t, -1)),
+    (r"(?:this\s+)?weekend|hujung\s+minggu(?:\s+ini)?", lambda m, t: _weekend_range(t, 0)),
+    (r"(?:next|coming)\s+week|minggu\s+(?:depan|hadapan)", lambda m, t: _week_range(t, 1)),
+    (r"last\s+week|minggu\s+(?:lepas|lalu)", lambda m, t: _week_range(t, -1)),
+    (r"this\s+week|minggu\s+ini", lambda m, t: _week_range(t, 0)),
+    (r"(?:next|coming)\s+month|bulan\s+(?:depan|hadapan)", _month(1)),
+    (r"last\s+month|bulan\s+(?:lepas|lalu)", _month(-1)),
+    (r"(?:rest\s+of\s+(?:this|the)\s+month)|baki\s+bulan\s+ini", _rest_of_month),
+    (r"this\s+month|bulan\s+ini", _month(0)),
+    (r"next\s+year|tahun\s+(?:depan|hadapan)", _year_range(1)),
+    (r"last\s+year|tahun\s+(?:lepas|lalu)", _year_range(-1)),
+    (r"this\s+year|tahun\s+ini", _year_range(0)),
+    (r"(?:next|coming)\s+(?P<n>\d{1,3})\s+days|(?P<n_ms>\d{1,3})\s+hari\s+(?:akan\s+datang|lagi|seterusnya)", _next_days),
+    (r"day\s+after\s+tomorrow|lusa", _fixed(2)),
+    (r"tomorrow|esok|besok", _fixed(1)),
+    (r"yesterday|semalam", _fixed(-1)),
+    (r"today|tonight|hari\s+ini|malam\s+ini", _fixed(0)),
+    (
+        rf"(?:on\s+|hari\s+)?(?:(?P<next>next\s+)|(?P<last>last\s+))?(?P<weekday>{_WEEKDAY_NAMES})"
+        rf"(?:(?P<next_ms>\s+(?:depan|hadapan))|(?P<last_ms>\s+(?:lepas|lalu)))?",
+        _weekday,
+    ),
+]
+
+_COMPILED = [(re.compile(rf"\b(?:{pattern})\b"), resolver) for pattern, resolver in PATTERNS]
+
+# Text between two expressions that makes them one range: "from X to Y",
+# "X hingga Y"; "and"/"dan" only after "between"/"antara". The connector
+# may also be the context word that starts the second match ("hingga 10 mei").
+_RANGE_GAP = re.compile(r"\s*(?:-|–|to|until|till|through|hingga|sehingga|sampai)\s*")
+_RANGE_WORD = re.compile(r"(?:to|until|till|hingga|sehingga|sampai|and|dan)\s+")
+_BETWEEN_GAP = re.compile(r"\s*(?:and|dan)\s*")
+_BETWEEN = re.compile(r"\b(?:between|antara)\s*$|(?:between|antara)\s")
+
+
+def _find_expressions(text: str, today: date) -> list[tuple[int, int, date, date]]:
+    """Non-overlapping (pos, end_pos, start, end) matches in order of appearance,
+    with explicit "from X to Y" ranges joined; earlier patterns win overlaps"""
+    found = []
+    for pattern, resolver in _COMPILED:
+        for m in pattern.finditer(text):
+            if any(m.start() < e and s < m.end() for s, e, _, _ in found):
+                continue
+            try:
+                start, end = resolver(m, today)
+            except ValueError:
+                # Invalid calendar date such as 31/02/2025
+                continue
+            found.append((m.start(), m.end(), start, end))
+    found.sort()
+
+    joined = []
+    for expression in found:
+        if joined:
+            pos, end_pos, start, end = joined[-1]
+            gap = text[end_pos:expression[0]]
+            leading = _RANGE_WORD.match(text, expression[0])
+            if leading:
+                gap += leading.group(0)
+            between = _BETWEEN.search(text[:pos]) or _BETWEEN.match(text, pos)
+            if _RANGE_GAP.fullmatch(gap) or (_BETWEEN_GAP.fullmatch(gap) and between):
+                joined[-1] = (pos, expression[1], min(start, expression[2]), max(end, expression[3]))
+                continue
+        joined.append(expression)
+    return joined
+
+
+def resolve_date_range(question: str, now: Optional[datetime] = None) -> Optional[DateRange]:
+    """Resolve the English/Malay temporal expressions in a question
+
+    Several expressions are merged into their overall span. The span is
+    exact when they cover it without gaps ("minggu ini atau minggu depan");
+    otherwise ("today or next month") exact is False and the span is only
+    an outer bound.
+
+    Args:
+        question: The user's question
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        DateRange with inclusive ISO start/end dates, or None if the question
+        contains no recognised temporal expression
+    """
+    today = (now or datetime.now()).date()
+    text = question.lower()
+
+    expressions = _find_expressions(text, today)
+    if not expressions:
+        return None
+
+    exact = True
+    covered_until = None
+    for _, _, start, end in sorted(expressions, key=lambda e: e[2]):
+        if covered_until is not None and start > covered_until + timedelta(days=1):
+            exact = False
+        covered_until = end if covered_until is None else max(covered_until, end)
+
+    return DateRange(
+        start=min(e[2] for e in expressions).isoformat(),
+        end=covered_until.isoformat(),
+        expression=", ".join(text[pos:end_pos].strip() for pos, end_pos, _, _ in expressions),
+        exact=exact,
+    )
+
+
+# Quoted strings/identifiers are matched first (group 1) so they are left untouched
+_CURRENT_DATE_RE = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|\b(?:current_date|today)\s*\(\s*\)|\bcurrent_date\b""",
+    re.IGNORECASE,
+)
+
+
+def substitute_current_date(sql_query: str, today: str) -> str:
+    """Replace CURRENT_DATE/today() in generated SQL with a literal date
+
+    The result no longer depends on the time of execution, so it is safe to
+    cache per (question, date).
+    """
+    return _CURRENT_DATE_RE.sub(lambda m: m.group(1) or f"DATE '{today}'", sql_query)
@@ -0,0 +1,221 @@
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# ai_agent builds its LLM client at import time; no request reaches it here
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+import api_server
+from api_server import RunTimeoutError, ServerBusyError, SingleFlight
+from llm_scheduler import LLMQueueFullError
+
+
+class Blocking:
+    """Fake stream_text2sql_workflow that blocks until released and counts runs"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.runs = 0
+
+    def __call__(self, question="q", thread_id=None):
+        self.runs += 1
+        self.started.set()
+        yield "temporal_agent", {"date_start": "2025-04-16"}
+        self.release.wait(5)
+        yield "duckdbsql_agent", {"sql_query": "SELECT 1"}
+        yield "__end__", {"final_answer": f"answer to {question}", "sql_query": "SELECT 1", "query_table": None}
+
+
+def test_identical_calls_share_one_run():
+    flight = SingleFlight(max_workers=2, max_pending=0)
+    workflow = Blocking()
+
+    runs = [flight.submit("key", workflow) for _ in range(5)]
+    workflow.release.set()
+
+    assert [shared for _, shared in runs] == [False, True, True, True, True]
+    assert len({id(run) for run, _ in runs}) == 1
+    assert runs[0][0].wait(5)["final_answer"] == "answer to q"
+    assert workflow.runs == 1
+    flight.shutdown()
+
+
+def test_late_subscriber_replays_events():
+    flight = SingleFlight(max_workers=1, max_pending=0)
+    workflow = Blocking()
+    run, _ = flight.submit("key", workflow)
+    workflow.started.wait(5)
+
+    late, shared = flight.submit("key", workflow)
+    workflow.release.set()
+    late.wait(5)
+
+    assert shared
+    events, done = late.events_since(0, timeout=0)
+    assert [event for event, _ in events] == ["temporal_agent", "duckdbsql_agent"]
+    assert done
+    flight.shutdown()
+
+
+def test_key_is_released_after_the_run():
+    flight = SingleFlight(max_workers=1, max_pending=0)
+    workflow = Blocking()
+    workflow.release.set()
+
+    run, _ = flight.submit("key", workflow)
+    run.wait(5)
+    flight._executor.submit(lambda: None).result(5)  # let _execute clean up
+
+    _, shared = flight.submit("key", workflow)
+    assert not shared
+    assert flight.in_flight() <= 1
+    flight.shutdown()
+
+
+def test_full_pool_raises_busy_then_recovers():
+    flight = SingleFlight(max_workers=1, max_pending=1)
+    workflow = Blocking()
+
+    first, _ = flight.submit("a", workflow)
+    flight.submit("b", workflow)
+    with pytest.raises(ServerBusyError):
+        flight.submit("c", workflow)
+    # Joining an in-flight run needs no new slot
+    assert flight.submit("a", workflow)[1]
+
+    workflow.release.set()
+    first.wait(5)
+    workflow.release.set()
+    flight.submit("b", workflow)[0].wait(5)
+    flight.submit("c", workflow)[0].wait(5)
+    flight.shutdown()
+
+
+def test_queued_run_is_cancelled_when_everyone_leaves():
+    flight = SingleFlight(max_workers=1, max_pending=1)
+    blocker, queued_workflow = Blocking(), Blocking()
+
+    running, _ = flight.submit("a", blocker)
+    blocker.started.wait(5)
+    queued, _ = flight.submit("b", queued_workflow)
+    queued.leave()
+    blocker.release.set()
+
+    with pytest.raises(RunTimeoutError):
+        queued.wait(5)
+    assert queued_workflow.runs == 0
+    # The cancelled run's slot is free again
+    flight.submit("c", Blocking())
+    flight.shutdown()
+
+
+def test_queued_run_survives_while_a_subscriber_waits():
+    flight = SingleFlight(max_workers=1, max_pending=1)
+    blocker, queued_workflow = Blocking(), Blocking()
+    queued_workflow.release.set()
+
+    flight.submit("a", blocker)
+    blocker.started.wait(5)
+    leader, _ = flight.submit("b", queued_workflow)
+    subscriber, _ = flight.submit("b", queued_workflow)
+    leader.leave()
+    blocker.release.set()
+
+    assert subscriber.wait(5)["final_answer"] == "answer to q"
+    assert queued_workflow.runs == 1
+    flight.shutdown()
+
+
+def test_wait_times_out():
+    flight = SingleFlight(max_workers=1, max_pending=0)
+    workflow = Blocking()
+    run, _ = flight.submit("key", workflow)
+
+    with pytest.raises(RunTimeoutError):
+        run.wait(0.05)
+    workflow.release.set()
+    flight.shutdown()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """API server on a free port with a fake workflow and its own worker pool"""
+    workflow = Blocking()
+    workflow.release.set()
+    flight = SingleFlight(max_workers=1, max_pending=0)
+    monkeypatch.setattr(api_server, "stream_text2sql_workflow", workflow)
+    monkeypatch.setattr(api_server, "single_flight", flight)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), api_server.APIHandler)
+    monkeypatch.setattr(api_server.APIHandler, "log_message", lambda *args: None)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1], workflow
+    httpd.shutdown()
+    httpd.server_close()
+    flight.shutdown()
+
+
+def post(port, path, body):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("POST", path, body=body if isinstance(body, (str, bytes)) else json.dumps(body))
+    response = conn.getresponse()
+    return response.status, dict(response.getheaders()), response.read().decode("utf-8")
+
+
+@pytest.mark.parametrize("body", ["not json", "[1, 2]", "\"text\"", {"thread_id": "t"}, {"question": "  "}])
+def test_bad_request_body(server, body):
+    port, _ = server
+    status, _, text = post(port, "/chat", body)
+    assert status == 400
+    assert "error" in json.loads(text)
+
+
+def test_chat_returns_answer(server):
+    port, _ = server
+    status, _, text = post(port, "/chat", {"question": "events today"})
+    assert status == 200
+    result = json.loads(text)
+    assert (result["answer"], result["sql_query"], result["coalesced"]) == ("answer to events today", "SELECT 1", False)
+
+
+def test_chat_stream_sends_node_events(server):
+    port, _ = server
+    status, headers, text = post(port, "/chat/stream", {"question": "events today"})
+    events = [line.split(": ", 1)[1] for line in text.splitlines() if line.startswith("event: ")]
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/event-stream")
+    assert events == ["accepted", "dates", "sql", "result", "done"]
+
+
+def test_busy_pool_returns_503(server):
+    port, workflow = server
+    workflow.release.clear()
+    waiting = threading.Thread(target=post, args=(port, "/chat", {"question": "slow"}))
+    waiting.start()
+    workflow.started.wait(5)
+
+    status, headers, _ = post(port, "/chat", {"question": "another"})
+    workflow.release.set()
+    waiting.join()
+
+    assert status == 503
+    assert int(headers["Retry-After"]) >= 1
+
+
+def test_llm_overload_returns_429(server, monkeypatch):
+    port, _ = server
+
+    def overloaded(question, thread_id):
+        raise LLMQueueFullError("LLM queue is full", retry_after=2.5)
+        yield
+
+    monkeypatch.setattr(api_server, "stream_text2sql_workflow", overloaded)
+    status, headers, _ = post(port, "/chat", {"question": "events today"})
+    assert status == 429
+    assert headers["Retry-After"] == "3"
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pytest
+
+from cache_warmer import CacheWarmer
+from query_cache import QueryLog
+
+
+class FakeClock:
+    """Manual clock; sleep() advances time instead of blocking"""
+
+    def __init__(self, start: datetime):
+        self.now = start.timestamp()
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(datetime(2025, 4, 16, 23, 0))
+
+
+def make_warmer(clock, questions=("events today", "events this week"), version=None, **kwargs):
+    warmed = []
+    version = version if version is not None else ["v1"]
+    warmer = CacheWarmer(
+        warm_fn=lambda question, now: warmed.append((question, now)),
+        top_questions_fn=lambda n: list(questions)[:n],
+        data_version_fn=lambda: version[0],
+        max_concurrency=1,
+        clock=clock,
+        sleep=clock.sleep,
+        **kwargs,
+    )
+    return warmer, warmed, version
+
+
+def test_startup_warms_then_nothing_pending(clock):
+    warmer, warmed, _ = make_warmer(clock, rate_per_minute=0)
+
+    report = warmer.check()
+
+    assert report["reason"] == "startup"
+    assert (report["questions"], report["warmed"], report["failed"]) == (2, 2, 0)
+    assert [q for q, _ in warmed] == ["events today", "events this week"]
+    assert warmed[0][1] == datetime(2025, 4, 16, 23, 0)
+    assert warmer.check() is None
+
+
+def test_day_rollover(clock):
+    warmer, warmed, _ = make_warmer(clock, rate_per_minute=0)
+    warmer.check()
+
+    clock.advance(30 * 60)
+    assert warmer.pending_reason() is None
+    clock.advance(31 * 60)
+
+    report = warmer.check()
+    assert report["reason"] == "day_rollover"
+    assert warmed[-1][1].date() == datetime(2025, 4, 17).date()
+
+
+def test_data_reload_refreshes_before_warming(clock):
+    calls = []
+    warmer, warmed, version = make_warmer(clock, rate_per_minute=0, reload_fn=lambda: calls.append(len(warmed)))
+    warmer.check()
+    assert calls == []
+
+    version[0] = "v2"
+    assert warmer.check()["reason"] == "data_reload"
+    # Reload hook runs once, before any question of that run is replayed
+    assert calls == [2]
+    assert warmer.check() is None
+
+
+def test_notify_reload(clock):
+    warmer, _, _ = make_warmer(clock, rate_per_minute=0)
+    warmer.check()
+
+    warmer.notify_reload()
+    assert warmer.pending_reason() == "data_reload"
+    warmer.check()
+    assert warmer.pending_reason() is None
+
+
+def test_rate_limit_spaces_questions(clock):
+    warmer, _, _ = make_warmer(clock, questions=["a", "b", "c"], rate_per_minute=6)
+
+    report = warmer.warm()
+
+    # 6 per minute -> one question every 10 seconds, first one immediately
+    assert clock.sleeps == [10.0, 10.0]
+    assert report["duration_seconds"] == 20.0
+
+
+def test_failures_are_counted(clock):
+    def warm_fn(question, now):
+        if question == "bad":
+            raise RuntimeError("boom")
+
+    warmer = CacheWarmer(
+        warm_fn=warm_fn,
+        top_questions_fn=lambda n: ["good", "bad"],
+        data_version_fn=lambda: "v1",
+        rate_per_minute=0,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    report = warmer.warm("manual")
+    assert (report["warmed"], report["failed"]) == (1, 1)
+    assert warmer.last_report == report
+
+
+def test_query_log_is_truncated_to_window(tmp_path):
+    log = QueryLog(path=str(tmp_path / "log.jsonl"), window=3)
+    for i in range(5):
+        log.append(f"question {i}", timestamp=i)
+    assert len((tmp_path / "log.jsonl").read_text().splitlines()) == 5
+
+    log.append("question 5", timestamp=5)
+    assert len((tmp_path / "log.jsonl").read_text().splitlines()) == 3
+    assert log.top_questions(10) == ["question 3", "question 4", "question 5"]
+
+
+def test_query_log_top_questions_groups_phrasings(tmp_path):
+    log = QueryLog(path=str(tmp_path / "log.jsonl"))
+    for question in ["Events today?", "events today", "events in Bangi", "EVENTS TODAY"]:
+        log.append(question)
+    assert log.top_questions(2) == ["EVENTS TODAY", "events in Bangi"]
@@ -0,0 +1,278 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, OpenAI
+
+from llm_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    LLMQueueFullError,
+    LLMQueueTimeoutError,
+    LLMScheduler,
+    TokenBucket,
+)
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after="0"):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+class ServerError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def connection_error():
+    return APIConnectionError(request=httpx.Request("POST", "https://example.invalid/v1/chat/completions"))
+
+
+class FakeClient:
+    """Stands in for OpenAI(); raises the queued errors first, then answers"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=10), content="ok")
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def start_waiter(scheduler, priority, outcomes, timeout=5.0):
+    def run():
+        try:
+            scheduler.acquire(1, priority, timeout=timeout)
+            outcomes.append((priority, "admitted"))
+        except Exception as e:
+            outcomes.append((priority, e))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_token_bucket_refills():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    # Requests larger than the bucket wait for a full bucket, not forever
+    assert bucket.wait_time(1000) == pytest.approx(59.5)
+
+
+def test_429_pauses_and_retries():
+    client = FakeClient(errors=[RateLimited("0")])
+    scheduler = LLMScheduler(client, max_retries=2)
+
+    response = scheduler.chat_completion(model="m", messages=MESSAGES)
+
+    assert response.content == "ok"
+    metrics = scheduler.metrics()
+    assert (client.calls, metrics["rate_limited"], metrics["completed"]) == (2, 1, 1)
+
+
+def test_429_gives_up_after_max_retries():
+    client = FakeClient(errors=[RateLimited("0")] * 3)
+    scheduler = LLMScheduler(client, max_retries=1)
+
+    with pytest.raises(RateLimited):
+        scheduler.chat_completion(model="m", messages=MESSAGES)
+    assert client.calls == 2
+    assert scheduler.metrics()["failed"] == 1
+
+
+def test_5xx_and_connection_errors_are_retried_with_backoff():
+    sleeps = []
+    client = FakeClient(errors=[ServerError(502), connection_error()])
+    scheduler = LLMScheduler(client, max_retries=2, sleep=sleeps.append)
+
+    response = scheduler.chat_completion(model="m", messages=MESSAGES)
+
+    assert response.content == "ok"
+    assert client.calls == 3
+    assert sleeps == [0.5, 1.0]
+    assert scheduler.metrics()["transient_errors"] == 2
+
+
+def test_transient_retries_share_the_budget():
+    sleeps = []
+    client = FakeClient(errors=[ServerError(503)] * 3)
+    scheduler = LLMScheduler(client, max_retries=2, sleep=sleeps.append)
+
+    with pytest.raises(ServerError):
+        scheduler.chat_completion(model="m", messages=MESSAGES)
+    assert client.calls == 3
+    assert scheduler.metrics()["failed"] == 1
+
+
+def test_transient_retry_respects_deadline():
+    client = FakeClient(errors=[ServerError(502)])
+    scheduler = LLMScheduler(client, max_retries=2, sleep=lambda seconds: None)
+
+    # The first backoff (0.5s) would overrun the call's 0.1s deadline
+    with pytest.raises(ServerError):
+        scheduler.chat_completion(timeout=0.1, model="m", messages=MESSAGES)
+    assert client.calls == 1
+
+
+def test_client_errors_are_not_retried():
+    client = FakeClient(errors=[ServerError(400)])
+    scheduler = LLMScheduler(client, max_retries=2, sleep=lambda seconds: None)
+
+    with pytest.raises(ServerError):
+        scheduler.chat_completion(model="m", messages=MESSAGES)
+    assert client.calls == 1
+
+
+def test_queue_timeout_has_retry_after():
+    scheduler = LLMScheduler(FakeClient(), requests_per_minute=60)
+    scheduler.request_bucket.tokens = 0
+
+    with pytest.raises(LLMQueueTimeoutError) as e:
+        scheduler.acquire(1, PRIORITY_INTERACTIVE, timeout=0.05)
+    assert e.value.retry_after >= 0
+    assert scheduler.metrics()["queued"] == 0
+
+
+def test_higher_priority_is_admitted_first():
+    scheduler = LLMScheduler(FakeClient(), requests_per_minute=120)
+    scheduler.request_bucket.tokens = 0
+    outcomes = []
+
+    batch = start_waiter(scheduler, PRIORITY_BATCH, outcomes)
+    wait_until(lambda: scheduler.metrics()["queued"] == 1)
+    interactive = start_waiter(scheduler, PRIORITY_INTERACTIVE, outcomes)
+    batch.join()
+    interactive.join()
+
+    assert outcomes == [(PRIORITY_INTERACTIVE, "admitted"), (PRIORITY_BATCH, "admitted")]
+
+
+def test_full_queue_evicts_lower_priority_waiter():
+    scheduler = LLMScheduler(FakeClient(), requests_per_minute=1, max_queue=1)
+    scheduler.request_bucket.tokens = 0
+    outcomes = []
+
+    batch = start_waiter(scheduler, PRIORITY_BATCH, outcomes)
+    wait_until(lambda: scheduler.metrics()["queued"] == 1)
+    # The interactive call takes the batch call's place, then times out itself
+    with pytest.raises(LLMQueueTimeoutError):
+        scheduler.acquire(1, PRIORITY_INTERACTIVE, timeout=0.1)
+    batch.join()
+
+    assert isinstance(outcomes[0][1], LLMQueueFullError)
+    assert outcomes[0][1].retry_after > 0
+    assert scheduler.metrics()["evicted"] == 1
+
+
+def test_full_queue_refuses_equal_or_lower_priority():
+    scheduler = LLMScheduler(FakeClient(), requests_per_minute=1, max_queue=1)
+    scheduler.request_bucket.tokens = 0
+    outcomes = []
+
+    interactive = start_waiter(scheduler, PRIORITY_INTERACTIVE, outcomes, timeout=0.3)
+    wait_until(lambda: scheduler.metrics()["queued"] == 1)
+    for priority in (PRIORITY_BATCH, PRIORITY_INTERACTIVE):
+        with pytest.raises(LLMQueueFullError) as e:
+            scheduler.acquire(1, priority, timeout=1)
+        assert e.value.retry_after > 0
+    interactive.join()
+
+    assert scheduler.metrics()["rejected"] == 2
+
+
+@pytest.fixture
+def fake_endpoint():
+    """Local OpenAI-compatible endpoint answering the queued error statuses
+    (default: one 429), then a completion"""
+    requests = []
+    statuses = [429]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            requests.append(self.path)
+            if statuses:
+                body = json.dumps({"error": {"message": "upstream error"}}).encode()
+                self.send_response(statuses.pop(0))
+                self.send_header("Retry-After", "0")
+            else:
+                body = json.dumps({
+                    "id": "cmpl-1",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": "fake",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "SELECT 1"},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+                }).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", requests, statuses
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("status, counter", [(429, "rate_limited"), (502, "transient_errors")])
+def test_openai_client_error_is_retried_once_by_scheduler(fake_endpoint, status, counter):
+    base_url, requests, statuses = fake_endpoint
+    statuses[:] = [status]
+    client = OpenAI(base_url=base_url, api_key="test", max_retries=0)
+    scheduler = LLMScheduler(client, max_retries=2, sleep=lambda seconds: None)
+
+    response = scheduler.chat_completion(model="fake", messages=MESSAGES)
+
+    assert response.choices[0].message.content == "SELECT 1"
+    # One error and one success: the client itself did not retry
+    assert requests == ["/v1/chat/completions"] * 2
+    assert scheduler.metrics()[counter] == 1
+
+
+def test_openai_client_connection_error_is_retried():
+    # Nothing listens on port 9 locally
+    client = OpenAI(base_url="http://127.0.0.1:9/v1", api_key="test", max_retries=0)
+    sleeps = []
+    scheduler = LLMScheduler(client, max_retries=1, sleep=sleeps.append)
+
+    with pytest.raises(APIConnectionError):
+        scheduler.chat_completion(model="fake", messages=MESSAGES)
+    assert sleeps == [0.5]
+    assert scheduler.metrics()["transient_errors"] == 1
@@ -0,0 +1,27 @@
+from query_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_byte_cap_evicts_oldest_and_skips_oversized():
+    cache = LRUCache(max_size=10, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+    assert cache.get("a") is None
+    assert cache.bytes == 8
+
+    # Replacing an entry doesn't double-count its size
+    cache.set("c", "xx")
+    assert cache.bytes == 6
+
+    cache.set("big", "x" * 11)
+    assert cache.get("big") is None
+    assert (cache.get("b"), cache.get("c")) == ("xxxx", "xx")
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from schema_registry import SchemaRegistry
+
+
+EVENTS_CSV = """event_day,event_date,event_title,event_url,blood_donation_location
+Sabtu,2025-04-12,KEMPEN DERMA DARAH,https://example.com/e/1,DEWAN BANGI
+Ahad,2025-04-13,PROGRAM DERMA,https://example.com/e/2,KIPMALL KOTA WARISAN
+Isnin,2025-04-14,KEMPEN DERMA DARAH,https://example.com/e/3,HOSPITAL KAJANG
+"""
+
+DONORS_CSV = """donor_name,blood_type,donor_age
+ALI,A+,30
+SITI,O-,41
+"""
+
+
+@pytest.fixture
+def registry(tmp_path):
+    events = tmp_path / "events.csv"
+    donors = tmp_path / "donors.csv"
+    events.write_text(EVENTS_CSV, encoding="utf-8")
+    donors.write_text(DONORS_CSV, encoding="utf-8")
+
+    registry = SchemaRegistry()
+    registry.register(
+        "events.csv",
+        str(events),
+        description="Blood donation events",
+        keywords=["event", "events", "blood", "donation"],
+        core_columns=["event_date", "event_title"],
+        column_keywords={"event_url": ["link", "url"], "blood_donation_location": ["where", "venue"]},
+    )
+    registry.register(
+        "donors.csv",
+        str(donors),
+        description="Registered donors",
+        keywords=["donor", "donors", "penderma"],
+        column_keywords={"blood_type": ["group"]},
+    )
+    return registry
+
+
+def selected(registry, question, **kwargs):
+    return {name: [c["name"] for c in columns] for name, columns in registry.relevant_schema(question, **kwargs).items()}
+
+
+def test_picks_matching_table(registry):
+    schema = selected(registry, "age of donors with blood group O-", max_tables=1)
+    assert list(schema) == ["donors.csv"]
+    assert "donor_age" in schema["donors.csv"]
+
+
+def test_keeps_core_and_matched_columns_only(registry):
+    schema = selected(registry, "where is the event at kipmall?")
+    assert schema["events.csv"] == ["event_date", "event_title", "blood_donation_location"]
+
+
+def test_table_keywords_do_not_select_columns(registry):
+    # "event" names the table; it must not pull in every event_* column
+    schema = selected(registry, "event link for KIPMALL")
+    assert "event_url" in schema["events.csv"]
+    assert "event_day" not in schema["events.csv"]
+
+
+def test_unmatched_question_falls_back_to_first_table(registry):
+    schema = selected(registry, "xyzzy")
+    assert schema == {"events.csv": ["event_date", "event_title"]}
+
+
+def test_max_columns_keeps_core_columns(registry):
+    schema = selected(registry, "event link where day", max_columns=3)
+    # Columns come back in file order
+    assert len(schema["events.csv"]) == 3
+    assert {"event_date", "event_title"} <= set(schema["events.csv"])
+
+
+def test_schema_text_omits_url_samples(registry):
+    text = registry.schema_text("event link for KIPMALL")
+    assert "Table: events.csv (NO quotes)" in text
+    assert "- event_url (VARCHAR)" in text
+    assert "https://" not in text
+    assert "'KIPMALL KOTA WARISAN'" in text
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM events.csv", "SELECT * FROM '{events}'"),
+    ("SELECT * FROM 'events.csv' e JOIN \"donors.csv\" d ON 1=1", "SELECT * FROM '{events}' e JOIN '{donors}' d ON 1=1"),
+    ("SELECT COUNT(*) FROM events.csv WHERE event_title ILIKE '%derma%'", "SELECT COUNT(*) FROM '{events}' WHERE event_title ILIKE '%derma%'"),
+    # Other identifiers/paths containing the name are left alone
+    ("SELECT * FROM old_events.csv", "SELECT * FROM old_events.csv"),
+    ("SELECT * FROM 'data/events.csv'", "SELECT * FROM 'data/events.csv'"),
+    ("SELECT * FROM events.csv.bak", "SELECT * FROM events.csv.bak"),
+])
+def test_resolve_table_refs(registry, sql, expected):
+    paths = {"events": registry.path("events.csv"), "donors": registry.path("donors.csv")}
+    assert registry.resolve_table_refs(sql) == expected.format(**paths)
+
+
+def test_refresh_stale_after_file_change(registry, tmp_path):
+    version = registry.data_version()
+    assert registry.refresh_stale() == []
+
+    donors = tmp_path / "donors.csv"
+    donors.write_text(DONORS_CSV + "AMIN,B+,25\nLIM,AB+,33\n", encoding="utf-8")
+    stat = os.stat(donors)
+    os.utime(donors, (stat.st_atime, stat.st_mtime + 10))
+
+    assert registry.data_version() != version
+    assert registry.refresh_stale() == ["donors.csv"]
+    blood_type = next(c for c in registry.columns("donors.csv") if c["name"] == "blood_type")
+    assert blood_type["distinct"] == 4
@@ -0,0 +1,84 @@
+import json
+
+from sql_exemplars import ExemplarStore, format_exemplars, vectorize
+
+
+def reject_bad_sql(sql: str):
+    if "BAD" in sql:
+        raise ValueError("Parser Error: syntax error")
+
+
+def write_pairs(path, pairs):
+    path.write_text("".join(json.dumps({"question": q, "sql": s}) + "\n" for q, s in pairs), encoding="utf-8")
+
+
+def test_vectors_are_normalised():
+    vector = vectorize("events in Bangi this week")
+    assert abs(float(vector @ vector) - 1.0) < 1e-5
+    assert not vectorize("").any()
+
+
+def test_search_ranks_most_similar_first(tmp_path):
+    path = tmp_path / "exemplars.jsonl"
+    write_pairs(path, [
+        ("How many events are there this month?", "SELECT COUNT(*) FROM t"),
+        ("List events in Bangi", "SELECT * FROM t WHERE event_location ILIKE '%bangi%'"),
+        ("Who organises the most events?", "SELECT organizer FROM t"),
+    ])
+    store = ExemplarStore(str(path))
+
+    results = store.search("events in Bangi", k=2)
+
+    assert results[0]["question"] == "List events in Bangi"
+    assert results[0]["score"] >= results[-1]["score"]
+    assert len(results) <= 2
+
+
+def test_search_applies_min_score(tmp_path):
+    store = ExemplarStore(str(tmp_path / "exemplars.jsonl"))
+    store.add("List events in Bangi", "SELECT 1", persist=False)
+
+    assert store.search("xyzzy qwerty", min_score=0.1) == []
+    assert store.search("List events in Bangi", min_score=0.99)[0]["score"] > 0.99
+
+
+def test_search_on_empty_store(tmp_path):
+    assert ExemplarStore(str(tmp_path / "missing.jsonl")).search("events") == []
+
+
+def test_matrix_grows_past_initial_rows(tmp_path):
+    store = ExemplarStore(str(tmp_path / "exemplars.jsonl"))
+    for i in range(40):
+        assert store.add(f"events in district number {i} word{i}", f"SELECT {i}", persist=False)
+
+    assert len(store) == 40
+    # Every row survived the resizes and is still retrievable
+    assert store.search("events in district number 37 word37", k=1)[0]["sql"] == "SELECT 37"
+    assert store.search("events in district number 0 word0", k=1)[0]["sql"] == "SELECT 0"
+
+
+def test_add_rejects_duplicates_and_invalid_sql(tmp_path):
+    path = tmp_path / "exemplars.jsonl"
+    store = ExemplarStore(str(path), validate=reject_bad_sql)
+
+    assert store.add("Events today?", "SELECT 1")
+    assert not store.add("  events TODAY?  ", "SELECT 2")
+    assert not store.add("Broken question", "SELECT BAD")
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["question"] for line in lines] == ["Events today?"]
+
+
+def test_load_skips_invalid_sql(tmp_path):
+    path = tmp_path / "exemplars.jsonl"
+    write_pairs(path, [("good", "SELECT 1"), ("bad", "SELECT BAD"), ("also good", "SELECT 2")])
+
+    store = ExemplarStore(str(path), validate=reject_bad_sql)
+
+    assert len(store) == 2
+    assert [e["question"] for e in store.search("good", k=5, min_score=0)] == ["good", "also good"]
+
+
+def test_format_exemplars():
+    assert format_exemplars([]) == "No similar examples available."
+    assert format_exemplars([{"question": "q", "sql": "SELECT 1", "score": 0.5}]) == "Q: q\nSQL: SELECT 1"
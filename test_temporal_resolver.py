@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+
+from temporal_resolver import resolve_date_range, substitute_current_date
+
+
+# Wednesday, 16 April 2025
+NOW = datetime(2025, 4, 16, 10, 30)
+
+
+@pytest.mark.parametrize("question, start, end", [
+    # Relative days
+    ("events today", "2025-04-16", "2025-04-16"),
+    ("acara hari ini", "2025-04-16", "2025-04-16"),
+    ("any events tomorrow?", "2025-04-17", "2025-04-17"),
+    ("ada acara esok?", "2025-04-17", "2025-04-17"),
+    ("lusa", "2025-04-18", "2025-04-18"),
+    ("yesterday", "2025-04-15", "2025-04-15"),
+    # Weeks (Monday-Sunday; the current week starts today)
+    ("this week", "2025-04-16", "2025-04-20"),
+    ("minggu ini", "2025-04-16", "2025-04-20"),
+    ("next week", "2025-04-21", "2025-04-27"),
+    ("minggu depan", "2025-04-21", "2025-04-27"),
+    ("last week", "2025-04-07", "2025-04-13"),
+    ("minggu lepas", "2025-04-07", "2025-04-13"),
+    # Weekends
+    ("this weekend", "2025-04-19", "2025-04-20"),
+    ("hujung minggu ini di Bangi", "2025-04-19", "2025-04-20"),
+    ("next weekend", "2025-04-26", "2025-04-27"),
+    ("hujung minggu lepas", "2025-04-12", "2025-04-13"),
+    # Months
+    ("this month", "2025-04-01", "2025-04-30"),
+    ("bulan depan", "2025-05-01", "2025-05-31"),
+    ("last month", "2025-03-01", "2025-03-31"),
+    ("events in Disember", "2025-12-01", "2025-12-31"),
+    ("acara bulan Mac", "2026-03-01", "2026-03-31"),
+    ("December 2025", "2025-12-01", "2025-12-31"),
+    ("in may", "2025-05-01", "2025-05-31"),
+    ("in dec", "2025-12-01", "2025-12-31"),
+    # Explicit dates
+    ("12 April 2025", "2025-04-12", "2025-04-12"),
+    ("20th of May", "2025-05-20", "2025-05-20"),
+    ("on 10 dec", "2025-12-10", "2025-12-10"),
+    ("2025-04-12", "2025-04-12", "2025-04-12"),
+    ("5/1/2026", "2026-01-05", "2026-01-05"),
+    # Weekdays and spans
+    ("on Saturday", "2025-04-19", "2025-04-19"),
+    ("Sabtu depan", "2025-04-26", "2025-04-26"),
+    ("next monday", "2025-04-21", "2025-04-21"),
+    ("next 3 days", "2025-04-16", "2025-04-18"),
+    ("7 hari akan datang", "2025-04-16", "2025-04-22"),
+    ("next year", "2026-01-01", "2026-12-31"),
+    ("last Saturday", "2025-04-12", "2025-04-12"),
+    ("hari Sabtu lepas", "2025-04-12", "2025-04-12"),
+    ("last wednesday", "2025-04-09", "2025-04-09"),
+    ("acara pada 3 Mei", "2025-05-03", "2025-05-03"),
+    # Explicit ranges
+    ("show events from 1 May to 10 May", "2025-05-01", "2025-05-10"),
+    ("events 1-10 May", "2025-05-01", "2025-05-10"),
+    ("1 to 10 May 2026", "2026-05-01", "2026-05-10"),
+    ("acara dari 1 Mei hingga 10 Mei", "2025-05-01", "2025-05-10"),
+    ("between 5 May and 12 May", "2025-05-05", "2025-05-12"),
+    ("antara 5 Mei dan 12 Mei", "2025-05-05", "2025-05-12"),
+    ("from today until next friday", "2025-04-16", "2025-04-25"),
+    ("bulan ini sampai bulan depan", "2025-04-01", "2025-05-31"),
+    # Several adjacent expressions merge into one exact span
+    ("minggu ini atau minggu depan", "2025-04-16", "2025-04-27"),
+    ("today and tomorrow", "2025-04-16", "2025-04-17"),
+])
+def test_resolves_expression(question, start, end):
+    date_range = resolve_date_range(question, now=NOW)
+    assert date_range is not None
+    assert (date_range["start"], date_range["end"]) == (start, end)
+    assert date_range["exact"]
+
+
+def test_separate_expressions_are_not_exact():
+    date_range = resolve_date_range("events today or next month?", now=NOW)
+    assert (date_range["start"], date_range["end"]) == ("2025-04-16", "2025-05-31")
+    assert date_range["expression"] == "today, next month"
+    assert not date_range["exact"]
+
+
+@pytest.mark.parametrize("question", [
+    "how many events are there?",
+    "may I know the events in Bangi",
+    "Blood drive at Jalan Dis",
+    "10 dec street",
+    "Dewan Jalan Jun",
+    "Jalan Mac Callum",
+    "kempen di Jalan 3 Mei",
+    "31/02/2026",
+])
+def test_no_expression(question):
+    assert resolve_date_range(question, now=NOW) is None
+
+
+def test_current_week_is_clipped_to_today_on_sunday():
+    date_range = resolve_date_range("this weekend", now=datetime(2025, 4, 20))
+    assert (date_range["start"], date_range["end"]) == ("2025-04-20", "2025-04-20")
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (
+        "SELECT * FROM t WHERE event_date = CURRENT_DATE",
+        "SELECT * FROM t WHERE event_date = DATE '2025-04-16'",
+    ),
+    (
+        "SELECT * FROM t WHERE event_date >= current_date() + INTERVAL '7 days'",
+        "SELECT * FROM t WHERE event_date >= DATE '2025-04-16' + INTERVAL '7 days'",
+    ),
+    (
+        "SELECT * FROM t WHERE event_title ILIKE '%current_date%' AND \"current_date\" = 1",
+        "SELECT * FROM t WHERE event_title ILIKE '%current_date%' AND \"current_date\" = 1",
+    ),
+    (
+        "SELECT 'it''s current_date', today()",
+        "SELECT 'it''s current_date', DATE '2025-04-16'",
+    ),
+])
+def test_substitute_current_date(sql, expected):
+    assert substitute_current_date(sql, "2025-04-16") == expected
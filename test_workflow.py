@@ -15,9 +15,14 @@ result = run_text2sql_workflow("list all events today")
 print("\n=== SQL Query ===")
 print(repr(result.get("sql_query")))
 
-print("\n=== Query Result (first 1000 chars) ===")
-query_result = result.get("query_result", "None")
-print(query_result[:1000] if query_result else "None")
+print("\n=== Query Result (first 10 rows) ===")
+query_table = result.get("query_table")
+if query_table is not None:
+    print(f"{query_table.num_rows} rows")
+    print(query_table.slice(0, 10))
+else:
+    # Status or error text when there are no rows
+    print(result.get("query_result") or "None")
 
 print("\n=== Final Answer ===")
 print(result.get("final_answer", "No answer"))